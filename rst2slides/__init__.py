@@ -9,3 +9,21 @@
 # For details, see https://github.com/llnl/rst2slides.
 #
 # This code is released under an MIT license, see LICENSE.txt for details.
+
+
+def render(source, parts=False, **options):
+    """Convert reStructuredText `source` string to a reveal.js presentation.
+
+    Returns the html as a string, or, if `parts` is true, the dict of
+    document parts docutils.core.publish_parts returns.  Keyword `options`
+    are docutils settings (stylesheet_path, initial_header_level, and the
+    like) overriding the rst2slides defaults.
+
+    Nothing is read from or written to files: docutils configuration files
+    are ignored, and reveal.js and MathJax are not downloaded.  Each call
+    uses its own settings and document, so render may be called from
+    several threads concurrently.
+    """
+    # Import here to keep "import rst2slides" and the command line fast.
+    from .slides import render
+    return render(source, parts, **options)
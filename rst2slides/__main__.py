@@ -8,6 +8,15 @@
 #
 # This code is released under an MIT license, see LICENSE.txt for details.
 
-from .slides import main
+import sys
+
+# Forward to a running rst2slides.daemon before importing docutils.
+from .daemon import forward
+
+status = forward(sys.argv)
+if status is not None:
+    sys.exit(status)
+
+from .slides import main  # noqa: E402
 
 main()
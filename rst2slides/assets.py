@@ -0,0 +1,222 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Find and publish the local files a presentation references.
+
+With the ``--hash-assets`` writer option, every file under the reveal.js
+directory which the presentation references (scripts, stylesheets, and the
+fonts and images those stylesheets reference in turn) is copied to a name
+containing a hash of its contents, for example::
+
+    ui/js/reveal.js  -->  ui/js/reveal.3f2a6c01be.js
+
+and the references in the html are rewritten to use the copies.  Since the
+name of the copy changes whenever its contents change, a web server may
+serve everything in the reveal.js directory with far-future cache headers;
+only the html itself must be revalidated.  A manifest mapping the original
+urls to the hashed urls is written next to the html, as
+presentation.manifest.json for presentation.html.
+
+The notes plugin and MathJax locate their own support files from the names
+of their scripts, so `unhashed` files keep their names.
+
+The hashed copies, and the purged stylesheets of ``--purge-css``, which
+several presentations may share, are recorded per presentation in
+``.rst2slides-generated.json`` in the reveal.js directory.  When a build
+replaces the files of a presentation, those of its previous build which no
+presentation still records are removed.
+
+"""
+
+import json
+import os
+import os.path
+import re
+from hashlib import sha256
+
+from .output import replace_file
+
+generations_file = '.rst2slides-generated.json'
+
+_scheme = re.compile(r'[a-zA-Z][-+.\w]*:')
+_quoted = re.compile(r'(["\'])([^"\'\s<>()]+\.[a-zA-Z0-9]+)\1')
+css_url = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+css_import = re.compile(r'(@import\s+)([\'"])([^\'"]+)\2')
+
+unhashed = ('notes.js', 'notes.html', 'MathJax.js')
+
+
+def is_remote(url):
+    """Is `url` absolute, a fragment, or a data url?"""
+    return (not url or url.startswith(('/', '#', 'data:')) or
+            bool(_scheme.match(url)))
+
+
+def local_path(url, base_dir):
+    """Return path to the existing local file `url` refers to, or None."""
+    if is_remote(url):
+        return None
+    url = url.split('#', 1)[0].split('?', 1)[0]
+    path = os.path.normpath(os.path.join(base_dir or os.curdir, url))
+    return path if os.path.isfile(path) else None
+
+
+def referenced_urls(text):
+    """Return quoted strings in `text` which look like relative file urls."""
+    return [url for _, url in _quoted.findall(text) if not is_remote(url)]
+
+
+def file_hash(path, size=10):
+    """Return leading `size` hex digits of sha256 hash of file at `path`."""
+    digest = sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()[:size]
+
+
+def is_under(path, directory):
+    path, directory = os.path.abspath(path), os.path.abspath(directory)
+    return path.startswith(directory.rstrip(os.sep) + os.sep)
+
+
+def hash_assets(html, html_dir, reveal_dir, generated=None):
+    """Copy assets referenced in `html` to hashed names.
+
+    Only files under `reveal_dir` are copied.  Relative urls in `html` and
+    `reveal_dir` are relative to `html_dir`.  Returns the rewritten html
+    and a dict mapping original to hashed urls.  The paths of the copies
+    are added to the `generated` set.
+    """
+    html_dir = html_dir or os.curdir
+    top = os.path.join(html_dir, reveal_dir)
+    copies = {}  # original path --> hashed path
+
+    def hashed(path):
+        if path in copies:
+            return copies[path]
+        copies[path] = path  # guard against @import cycles
+        with open(path, 'rb') as f:
+            data = f.read()
+        if path.endswith('.css'):
+            data = rewrite_css(data.decode('utf-8'),
+                               os.path.dirname(path)).encode('utf-8')
+        digest = sha256(data).hexdigest()[:10]
+        root, ext = os.path.splitext(path)
+        copy = '{}.{}{}'.format(root, digest, ext)
+        if not os.path.isfile(copy):
+            with open(copy, 'wb') as f:
+                f.write(data)
+        if generated is not None:
+            generated.add(copy)
+        copies[path] = copy
+        return copy
+
+    def rewrite_css(css, css_dir):
+        def new_url(url):
+            path = local_path(url, css_dir)
+            if path is None or os.path.basename(path) in unhashed:
+                return url
+            suffix = url[len(url.split('#', 1)[0].split('?', 1)[0]):]
+            copy = os.path.relpath(hashed(path), css_dir)
+            return copy.replace(os.sep, '/') + suffix
+
+        css = css_url.sub(lambda m: 'url({0}{1}{0})'.format(
+            m.group(1), new_url(m.group(2))), css)
+        return css_import.sub(lambda m: m.group(1) + m.group(2) +
+                              new_url(m.group(3)) + m.group(2), css)
+
+    manifest = {}
+
+    def replace(match):
+        quote, url = match.groups()
+        path = local_path(url, html_dir)
+        if (path is None or not is_under(path, top) or
+                os.path.basename(path) in unhashed):
+            return match.group(0)
+        copy = os.path.relpath(hashed(path), html_dir).replace(os.sep, '/')
+        manifest[url] = copy
+        return quote + copy + quote
+
+    if is_remote(reveal_dir):
+        return html, manifest
+    return _quoted.sub(replace, html), manifest
+
+
+def used_files(html, html_dir, top=None):
+    """Return set of local files `html` uses, optionally only under `top`.
+
+    Includes the files used by the stylesheets `html` references.
+    """
+    found = set()
+
+    def add(path):
+        if path is None or path in found:
+            return
+        if top is not None and not is_under(path, top):
+            return
+        found.add(path)
+        if path.endswith('.css'):
+            with open(path, 'rb') as f:
+                css = f.read().decode('utf-8', 'replace')
+            css_dir = os.path.dirname(path)
+            for _, url in css_url.findall(css):
+                add(local_path(url, css_dir))
+            for _, _, url in css_import.findall(css):
+                add(local_path(url, css_dir))
+
+    for url in referenced_urls(html):
+        add(local_path(url, html_dir))
+    return found
+
+
+def replace_generation(top, destination_path, paths):
+    """Record `paths` as the files under `top` made for `destination_path`.
+
+    The files recorded for `destination_path` by its previous build, which
+    no presentation records now, are removed, with their precompressed
+    siblings.  Call holding the install lock of `top`, so that the files
+    are not removed while another build is choosing which to reuse.
+    """
+    record = os.path.join(top, generations_file)
+    if not paths and not os.path.isfile(record):
+        return
+    try:
+        with open(record) as f:
+            generations = json.load(f)
+    except (OSError, ValueError):
+        generations = {}
+    owner = os.path.relpath(destination_path, top).replace(os.sep, '/')
+    old = set(generations.pop(owner, ()))
+    if paths:
+        generations[owner] = sorted(
+            os.path.relpath(path, top).replace(os.sep, '/') for path in paths)
+    in_use = set()
+    for names in generations.values():
+        in_use.update(names)
+    for name in old - in_use:
+        if name.startswith(('/', '../')):
+            continue  # not a file under top
+        path = os.path.join(top, *name.split('/'))
+        for stale in (path, path + '.gz', path + '.br'):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    replace_file(record, (json.dumps(generations, indent=1, sort_keys=True) +
+                          '\n').encode('utf-8'))
+
+
+def write_manifest(destination_path, manifest):
+    """Write `manifest` next to html `destination_path`."""
+    path = os.path.splitext(destination_path)[0] + '.manifest.json'
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+        f.write('\n')
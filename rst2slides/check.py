@@ -0,0 +1,96 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Check presentations for errors without building them.
+
+Run as::
+
+    python -m rst2slides --check presentation.rst [...]
+
+Each presentation is parsed and the reveal.js directive transforms are
+applied, but nothing is translated to html, written, or downloaded.  Local
+images, videos, and backgrounds the presentation uses must exist, relative
+to the directory containing the presentation.  Each problem is printed on
+standard output as one line of JSON::
+
+    {"file": "talk.rst", "line": 12, "level": "ERROR",
+     "message": "unrecognized reveal.js transition swoosh"}
+
+The exit status is 1 if any presentation has errors (or missing media
+files), 0 otherwise.  Warnings are reported but do not fail the check.
+Only presentation files may follow --check; any other option, or no
+files at all, is an error (exit status 2).
+
+"""
+
+import json
+import os.path
+import sys
+
+from docutils import io, nodes
+from docutils.core import publish_doctree
+
+from .assets import is_remote
+from .deps import media_uris
+
+check_overrides = {'report_level': 2, 'halt_level': 5,
+                   'warning_stream': False}
+
+
+def check(path, settings_overrides=None):
+    """Return list of diagnostic dicts for presentation source `path`."""
+    from .slides import Parser, settings_overrides as overrides
+    overrides = dict(overrides, **check_overrides)
+    overrides.update(settings_overrides or {})
+    diagnostics = []
+    try:
+        document = publish_doctree(None, source_path=path,
+                                   source_class=io.FileInput,
+                                   parser=Parser(),
+                                   settings_overrides=overrides)
+    except (IOError, UnicodeError) as e:
+        return [{'file': path, 'line': None, 'level': 'SEVERE',
+                 'message': str(e)}]
+    for msg in document.findall(nodes.system_message):
+        if msg['level'] < overrides['report_level']:
+            continue
+        text = msg[0].astext() if len(msg) else ''
+        diagnostics.append({'file': msg.get('source') or path,
+                            'line': msg.get('line'), 'level': msg['type'],
+                            'message': text})
+    top = os.path.dirname(path)
+    for element, uri in media_uris(document):
+        if is_remote(uri):
+            continue
+        local = uri.split('#', 1)[0].split('?', 1)[0]
+        if not os.path.exists(os.path.join(top, local)):
+            # A background is an attribute of its section.
+            source, line = getattr(element, 'background_location',
+                                   (element.source, element.line))
+            diagnostics.append({'file': source or path, 'line': line,
+                                'level': 'ERROR',
+                                'message': 'missing media file ' + uri})
+    return diagnostics
+
+
+def check_main(paths, stream=None):
+    """Check presentation sources `paths`, return exit status."""
+    if not paths:
+        sys.stderr.write('rst2slides: error: --check requires presentation '
+                         'files\n')
+        return 2
+    stream = stream or sys.stdout
+    status = 0
+    for path in paths:
+        for diagnostic in check(path):
+            stream.write(json.dumps(diagnostic, sort_keys=True) + '\n')
+            if diagnostic['level'] not in ('INFO', 'WARNING', 'DEBUG'):
+                status = 1
+    return status
@@ -0,0 +1,226 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Chunked output for very large presentations.
+
+With the ``--chunk-slides=N`` writer option, only the title page and the
+first N top-level slides are written to the presentation html file.  Each
+remaining top-level slide (including its vertical subslides) is written to
+its own fragment file in a directory next to the presentation::
+
+    presentation.html
+    presentation_slides/
+        slide-0012.html
+        slide-0013.html
+        ...
+
+and replaced in the presentation by an empty placeholder section::
+
+    <section data-chunk="presentation_slides/slide-0012.html"
+             data-chunk-ids="twelfth-slide sub-one sub-two" id="twelfth-slide">
+    </section>
+
+The placeholders keep the reveal.js slide count, navigation, and progress
+bar correct.  The chunks.js plugin, installed in the reveal.js plugin
+directory, fetches the fragments as the presenter approaches them, and
+also resolves #/slide-id deep links into slides which have not been loaded.
+Code blocks and math in a loaded fragment are highlighted and typeset as
+they would have been in the presentation itself.  A fragment which fails
+to load is tried again when the presenter next changes slides.  Browsers
+generally refuse to fetch fragments from file:// URLs, so chunked
+presentations must be served over http.
+
+Fragments left in the directory by an earlier build, which this build did
+not write, are removed.
+
+"""
+
+import os
+import os.path
+import re
+
+from .download import install_file
+
+_fragment = re.compile(r'slide-\d{4}\.html(\.gz|\.br)?$')
+
+
+def chunk_dir(destination_path):
+    """Return fragment directory name for html `destination_path`."""
+    if not destination_path:
+        return None
+    base = os.path.splitext(os.path.basename(destination_path))[0]
+    return base + '_slides'
+
+
+def chunk_name(directory, index):
+    return '{}/slide-{:04d}.html'.format(directory, index)
+
+
+def write_chunks(destination_path, chunks, encoding='utf-8',
+                 errors='strict'):
+    """Write (url, html) `chunks` relative to `destination_path`.
+
+    The fragments have the `encoding` of the presentation, which the
+    loader uses to decode them.  Returns the list of paths written.
+    """
+    top = os.path.dirname(destination_path)
+    paths = []
+    for url, html in chunks:
+        path = os.path.join(top, *url.split('/'))
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(path, 'w', encoding=encoding, errors=errors) as f:
+            f.write(html)
+        paths.append(path)
+    return paths
+
+
+def remove_stale_chunks(destination_path, directory, keep=()):
+    """Remove fragments in `directory` beside `destination_path`.
+
+    Fragments in `keep`, and the precompressed siblings of those, are left.
+    The directory itself is removed if that leaves it empty.
+    """
+    top = os.path.join(os.path.dirname(destination_path), directory)
+    try:
+        names = os.listdir(top)
+    except OSError:
+        return
+    keep = {os.path.normpath(path) for path in keep}
+    for name in names:
+        match = _fragment.match(name)
+        if not match:
+            continue
+        path = os.path.join(top, name)
+        if os.path.normpath(path[:len(path) - len(match.group(1) or '')]
+                            ) not in keep:
+            os.remove(path)
+    try:
+        os.rmdir(top)
+    except OSError:
+        pass  # not empty
+
+
+def install_loader(reveal_dir):
+    """Write the chunks.js plugin into the `reveal_dir` plugin directory."""
+    path = os.path.join(reveal_dir, 'plugin', 'chunks', 'chunks.js')
+    install_file(path, loader_js, if_changed=True)
+
+
+loader_js = """\
+/*
+ * rst2slides chunk loader: fetch slides written to separate fragment files
+ * by the rst2slides --chunk-slides option as the presenter approaches them.
+ */
+(function() {
+    var ahead = 3;  // number of slides to load beyond the current slide
+
+    function placeholders() {
+        return document.querySelectorAll(
+            '.reveal .slides > section[data-chunk]');
+    }
+
+    // Do for a loaded fragment what the highlight and math plugins did
+    // for the slides in the presentation html.
+    function render(element) {
+        if (window.hljs) {
+            var blocks = element.querySelectorAll('pre code');
+            for (var i = 0; i < blocks.length; i++) {
+                hljs.highlightBlock(blocks[i]);
+            }
+        }
+        if (window.MathJax && MathJax.Hub) {
+            MathJax.Hub.Queue(['Typeset', MathJax.Hub, element]);
+        }
+    }
+
+    function load(section, callback) {
+        if (section.getAttribute('data-chunk-loading')) return;
+        section.setAttribute('data-chunk-loading', 'true');
+        var xhr = new XMLHttpRequest();
+        function failed() {  // try again on the next slide change
+            section.removeAttribute('data-chunk-loading');
+        }
+        xhr.onerror = failed;
+        xhr.onload = function() {
+            if (xhr.status && xhr.status !== 200) return failed();
+            var holder = document.createElement('div');
+            holder.innerHTML = xhr.responseText;
+            var parent = section.parentNode;
+            var loaded = [];
+            while (holder.firstChild) {
+                loaded.push(holder.firstChild);
+                parent.insertBefore(holder.firstChild, section);
+            }
+            parent.removeChild(section);
+            for (var i = 0; i < loaded.length; i++) {
+                if (loaded[i].nodeType === 1) render(loaded[i]);
+            }
+            var indices = Reveal.getIndices();
+            Reveal.sync();
+            Reveal.slide(indices.h, indices.v, indices.f);
+            if (callback) callback();
+        };
+        xhr.open('GET', section.getAttribute('data-chunk'));
+        if (xhr.overrideMimeType && document.characterSet) {
+            // the fragments have the encoding of the presentation
+            xhr.overrideMimeType('text/html; charset=' +
+                                 document.characterSet);
+        }
+        xhr.send();
+    }
+
+    function loadNearby() {
+        var h = Reveal.getIndices().h;
+        var slides = document.querySelectorAll('.reveal .slides > section');
+        var last = Math.min(slides.length - 1, h + ahead);
+        for (var i = Math.max(0, h - 1); i <= last; i++) {
+            if (slides[i].hasAttribute('data-chunk')) load(slides[i]);
+        }
+    }
+
+    function loadDeepLink() {
+        var name = window.location.hash.replace(/^#\\/?/, '').split('/')[0];
+        name = decodeURIComponent(name);
+        if (!name || /^[0-9]+$/.test(name) || document.getElementById(name)) {
+            return;
+        }
+        var sections = placeholders();
+        for (var i = 0; i < sections.length; i++) {
+            var ids = sections[i].getAttribute('data-chunk-ids') || '';
+            ids = ids.split(' ');
+            if (ids.indexOf(name) >= 0) {
+                load(sections[i], function() {
+                    var element = document.getElementById(name);
+                    if (element) {
+                        var indices = Reveal.getIndices(element);
+                        Reveal.slide(indices.h, indices.v);
+                    }
+                });
+                return;
+            }
+        }
+    }
+
+    function start() {
+        loadDeepLink();
+        loadNearby();
+    }
+
+    Reveal.addEventListener('slidechanged', loadNearby);
+    window.addEventListener('hashchange', loadDeepLink, false);
+    if (Reveal.isReady()) {
+        start();
+    } else {
+        Reveal.addEventListener('ready', start);
+    }
+})();
+"""
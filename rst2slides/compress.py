@@ -0,0 +1,108 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Write precompressed siblings of a presentation and its assets.
+
+With the ``--precompress`` writer option, a gzip-compressed
+presentation.html.gz is written next to presentation.html, and likewise
+for the other files the writer generates (slide fragments, search index,
+service worker) and every text file (scripts, stylesheets, fonts other than
+woff) the presentation uses from the reveal.js directory.  If the brotli module is
+installed, .br siblings are written as well.  Static file servers such as
+nginx (gzip_static) can then send the compressed files without
+compressing on every request.
+
+Files are compressed in parallel, and a file whose compressed sibling is
+newer than the file itself is skipped, so that repeated builds only
+compress what changed.
+
+"""
+
+import gzip
+import os
+import os.path
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from .assets import used_files
+
+# Already compressed formats gain nothing from another round.
+compressible = ('.html', '.htm', '.css', '.js', '.json', '.svg', '.xml',
+                '.txt', '.map', '.ttf', '.otf', '.eot', '.md')
+
+
+def gzip_data(data):
+    out = BytesIO()
+    # mtime=0 makes the output reproducible
+    with gzip.GzipFile(filename='', mode='wb', fileobj=out, compresslevel=9,
+                       mtime=0) as z:
+        z.write(data)
+    return out.getvalue()
+
+
+def encoders():
+    """Return list of (suffix, compress function) available."""
+    found = [('.gz', gzip_data)]
+    if brotli is not None:
+        found.append(('.br', brotli.compress))
+    return found
+
+
+def is_stale(path, sibling):
+    try:
+        return os.path.getmtime(sibling) < os.path.getmtime(path)
+    except OSError:
+        return True
+
+
+def compress_file(path):
+    """Write compressed siblings of `path`, return number written."""
+    count, data = 0, None
+    for suffix, compress in encoders():
+        sibling = path + suffix
+        if not is_stale(path, sibling):
+            continue
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        tmp = sibling + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(compress(data))
+        os.replace(tmp, sibling)
+        count += 1
+    return count
+
+
+def precompress(paths, jobs=None):
+    """Compress `paths` in parallel, return number of siblings written."""
+    paths = sorted(p for p in set(paths)
+                   if os.path.splitext(p)[1].lower() in compressible)
+    if not paths:
+        return 0
+    with ThreadPoolExecutor(max_workers=jobs or min(8, len(paths))) as pool:
+        return sum(pool.map(compress_file, paths))
+
+
+def precompress_presentation(html, destination_path, reveal_dir,
+                             outputs=()):
+    """Compress the `html` written to `destination_path` and its assets.
+
+    The other `outputs` the writer generated are compressed as well.
+    """
+    html_dir = os.path.dirname(destination_path) or os.curdir
+    paths = used_files(html, html_dir, os.path.join(html_dir, reveal_dir))
+    paths.add(destination_path)
+    paths.update(outputs)
+    return precompress(paths)
@@ -0,0 +1,298 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Build presentations in a warm background process.
+
+Most of the time a small presentation takes to build is spent starting
+python and importing docutils.  This module can be run as a script to
+start a daemon which has rst2slides and docutils loaded::
+
+    python -m rst2slides.daemon [--socket=PATH] &
+    python -m rst2slides.daemon --stop [--socket=PATH]
+
+While the daemon is running, ``python -m rst2slides`` forwards its command
+line, working directory, environment, and standard input, output, and
+error (the file descriptors themselves) over a Unix socket, and exits with
+the status of the build.  The daemon forks a child for each build, so
+every build starts from the same freshly imported state and cannot disturb
+other builds.  The daemon builds the command line option parser, which
+reads the docutils configuration files, ahead of the fork, and keeps it
+for later builds with the same configuration files (the same files, with
+the same modification times) in their directory and environment.  If no
+daemon is running, the RST2SLIDES_NO_DAEMON environment variable is set,
+or the platform has no Unix sockets, ``python -m rst2slides`` builds
+in-process as usual.
+
+The socket is $RST2SLIDES_SOCKET if set, otherwise rst2slides-UID.sock in
+$XDG_RUNTIME_DIR or the temporary directory.  It is accessible only to
+its owner, and a client ignores a socket which belongs to another user.
+The daemon keeps the rst2slides it started with, so restart it after
+changing or upgrading rst2slides.  Unix only.
+
+"""
+
+import array
+import json
+import os
+import os.path
+import signal
+import socket
+import sys
+import tempfile
+import traceback
+
+_stdio = 3  # number of file descriptors forwarded: stdin, stdout, stderr
+_chunk = 1 << 16
+_receive_timeout = 10  # seconds a client may take to send its request
+_max_parsers = 8
+
+
+def socket_path():
+    """Return path of the daemon socket."""
+    path = os.environ.get('RST2SLIDES_SOCKET')
+    if path:
+        return path
+    top = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(top, 'rst2slides-{}.sock'.format(os.getuid()))
+
+
+def connect(path):
+    """Return socket connected to daemon at `path`, or None."""
+    try:
+        if os.stat(path).st_uid != os.getuid():
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    except (OSError, AttributeError):  # no daemon, or not Unix
+        return None
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def receive_all(sock):
+    chunks = []
+    for chunk in iter(lambda: sock.recv(_chunk), b''):
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def forward(argv, path=None):
+    """Run rst2slides command line `argv` in the daemon, return exit status.
+
+    Return None if there is no daemon to run it, so the caller should build
+    in-process.
+    """
+    if os.environ.get('RST2SLIDES_NO_DAEMON'):
+        return None
+    if not hasattr(socket, 'AF_UNIX') or not hasattr(os, 'getuid'):
+        return None  # Windows
+    sock = connect(path or socket_path())
+    if sock is None:
+        return None
+    with sock:
+        request = json.dumps({'argv': argv, 'cwd': os.getcwd(),
+                              'env': dict(os.environ)}).encode('utf-8')
+        fds = array.array('i', range(_stdio))
+        try:
+            sys.stdout.flush()
+            sent = sock.sendmsg([request], [(socket.SOL_SOCKET,
+                                             socket.SCM_RIGHTS, fds)])
+            sock.sendall(request[sent:])
+            sock.shutdown(socket.SHUT_WR)
+        except OSError:  # daemon went away before taking the build
+            return None
+        reply = receive_all(sock)
+    try:
+        return int(reply)
+    except ValueError:
+        sys.stderr.write('rst2slides daemon: build died\n')
+        return 1
+
+
+def receive_request(conn):
+    """Return (request, file descriptors) sent by `forward`."""
+    size = socket.CMSG_LEN(_stdio * array.array('i').itemsize)
+    data, ancdata, _, _ = conn.recvmsg(_chunk, size)
+    fds = array.array('i')
+    for level, kind, cdata in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(cdata[:len(cdata) - len(cdata) % fds.itemsize])
+    request = json.loads((data + receive_all(conn)).decode('utf-8'))
+    return request, list(fds)
+
+
+def config_key(request):
+    """Return key for the docutils configuration files a build reads.
+
+    The key lists the path, modification time, and size of every standard
+    configuration file which exists in the directory and environment of
+    the build `request`.
+    """
+    from docutils.frontend import OptionParser
+    env, key = request['env'], []
+    names = env.get('DOCUTILSCONFIG')
+    names = (names.split(os.pathsep) if names is not None
+             else OptionParser.standard_config_files)
+    for name in names:
+        if not name.strip():
+            continue
+        if name.startswith('~') and env.get('HOME'):
+            name = env['HOME'] + name[1:]
+        path = os.path.join(request['cwd'], name)
+        try:
+            info = os.stat(path)
+        except OSError:
+            continue
+        key.append((path, info.st_mtime_ns, info.st_size))
+    return tuple(key)
+
+
+def build_parser(request):
+    """Return option parser for build `request`, or None on failure."""
+    from .slides import option_parser
+    cwd, env = os.getcwd(), dict(os.environ)
+    try:
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update(request['env'])
+        return option_parser()
+    except Exception:  # the build reports a bad configuration file
+        return None
+    finally:
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(env)
+
+
+def run_build(conn, request, fds, parser):
+    """Run the build `request` in this (forked) process and exit.
+
+    The standard input, output, and error of the build are `fds`, and
+    `parser` is its command line option parser, or None.
+    """
+    from .slides import main
+    status = 1
+    try:
+        if len(fds) != _stdio:
+            raise ValueError('expected {} file descriptors'.format(_stdio))
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+            os.close(fd)
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update(request['env'])
+        sys.argv = list(request['argv'])
+        try:
+            main(parser)
+            status = 0
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                status = e.code or 0
+            else:
+                sys.stderr.write('{}\n'.format(e.code))
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            conn.sendall(str(status).encode('ascii'))
+        finally:
+            os._exit(0)
+
+
+def serve(path=None):
+    """Accept builds on the socket at `path` until interrupted."""
+    from .server import warm_worker
+    if not hasattr(socket, 'AF_UNIX') or not hasattr(os, 'fork'):
+        raise SystemExit('rst2slides daemon requires Unix')
+    path = path or socket_path()
+    sock = connect(path)
+    if sock is not None:
+        sock.close()
+        raise SystemExit('rst2slides daemon already running on ' + path)
+    if os.path.exists(path):
+        os.remove(path)  # left by a daemon which was killed
+    warm_worker()
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177)
+    try:
+        listener.bind(path)
+    finally:
+        os.umask(umask)
+    listener.listen(16)
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # no zombies
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print('rst2slides daemon listening on {}'.format(path))
+    sys.stdout.flush()
+    parsers = {}  # config_key: option parser
+    try:
+        while True:
+            conn, _ = listener.accept()
+            fds = []
+            try:
+                conn.settimeout(_receive_timeout)
+                request, fds = receive_request(conn)
+                conn.settimeout(None)
+                if request.get('stop'):
+                    conn.sendall(b'0')
+                    break
+                key = config_key(request)
+                if key not in parsers:
+                    if len(parsers) >= _max_parsers:
+                        parsers.clear()
+                    parsers[key] = build_parser(request)
+                if os.fork() == 0:
+                    listener.close()
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                    run_build(conn, request, fds, parsers[key])
+            except (OSError, ValueError, KeyError):
+                pass  # a client which went away or sent garbage
+            finally:
+                conn.close()
+                for fd in fds:
+                    os.close(fd)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        os.remove(path)
+
+
+def stop(path=None):
+    """Stop the daemon on the socket at `path`, return exit status."""
+    sock = connect(path or socket_path())
+    if sock is None:
+        print('no rst2slides daemon running')
+        return 1
+    with sock:
+        sock.sendall(json.dumps({'stop': True}).encode('utf-8'))
+        sock.shutdown(socket.SHUT_WR)
+        receive_all(sock)
+    return 0
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if '-h' in args or '--help' in args:
+        print('Usage: python -m rst2slides.daemon [--stop] [--socket=PATH]')
+        sys.exit(0)
+    path = None
+    for arg in list(args):
+        if arg.startswith('--socket='):
+            path = arg.split('=', 1)[1]
+            args.remove(arg)
+    if '--stop' in args:
+        sys.exit(stop(path))
+    serve(path)
@@ -0,0 +1,400 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Generate slides from the rows of a data file.
+
+The data-slides directive expands its content, an rst template, once for
+every row of a CSV, TSV, or JSON Lines file::
+
+    .. data-slides:: results/runs.csv
+
+       Run ${name}
+       ===========
+
+       .. background:: plots/${name}.png
+
+       .. reveal-state:: ${status}
+
+       * accuracy: ${accuracy}
+       * loss: ${loss}
+
+Fields are substituted with the python string.Template syntax, where
+``${column name}`` may name any column and ``$$`` is a literal dollar
+sign.  The template must consist of sections: the first title style it
+uses makes top-level slides, the next one vertical slides below them.
+Directives in the template (background, reveal-state, transition, aside,
+code, and so on) work as they do anywhere else.  Hyperlink targets,
+footnotes, citations, and substitutions defined in the template belong to
+its row: a reference in a row refers to the definition in the same row,
+or, if the row has none, to a target elsewhere in the document.  The
+generated slides follow the top-level slide containing the directive, or
+the title page if the directive is there.  The data file path is relative
+to the source file, and options are:
+
+format
+   ``csv``, ``tsv``, or ``jsonl`` (one JSON object per line), by default
+   from the file extension.
+encoding
+   Text encoding of the data file, by default the input encoding.
+
+The file is read one row at a time, and each expanded row is parsed into
+its own small doctree, so the rst text of all the rows never exists at
+once.  The slides are cached in a pickle file in the .rst2slides-cache
+directory beside the data file, keyed by a hash of the contents of the data
+file, the template, and the options, so an unchanged data file is not
+parsed again.  The cache also records the hashes of the files the rows
+pulled in (with include directives, say), and is stale if any of them
+change.  Since unpickling a file can run arbitrary code, each cache file is
+signed with a random key private to the user, ~/.rst2slides-key, and a
+file without a valid signature is ignored.  The cache directory may be
+removed at any time.
+
+"""
+
+import csv
+import hmac
+import json
+import os
+import os.path
+import pickle
+from hashlib import sha256
+from string import Template
+
+import docutils
+from docutils import nodes, utils
+from docutils.statemachine import StringList, string2lines
+from docutils.parsers.rst import Directive, directives, states
+from docutils.transforms import Transform, references
+from docutils.utils import new_document
+
+from .doctree import adopt, detach
+from .output import file_digest, replace_file
+from .directives import choice_validator
+
+cache_dir = '.rst2slides-cache'
+cache_version = 3
+key_file = os.path.join('~', '.rst2slides-key')
+data_formats = {'.csv': 'csv', '.tsv': 'tsv', '.jsonl': 'jsonl',
+                '.ndjson': 'jsonl'}
+# Applied to each row, so that names defined in the template are local to
+# the row.  DanglingReferences is left for the whole document.
+row_transforms = (references.Substitutions, references.PropagateTargets,
+                  references.AnonymousHyperlinks,
+                  references.IndirectHyperlinks, references.Footnotes,
+                  references.ExternalTargets, references.InternalTargets)
+reference_nodes = (nodes.target, nodes.reference, nodes.footnote,
+                   nodes.footnote_reference, nodes.citation,
+                   nodes.citation_reference, nodes.substitution_definition,
+                   nodes.substitution_reference)
+
+
+class RowTemplate(Template):
+    braceidpattern = r'[^{}]+'  # ${any column name}
+
+
+def read_rows(path, data_format, encoding):
+    """Yield the rows of data file `path` as dicts, one at a time."""
+    with open(path, encoding=encoding, newline='') as f:
+        if data_format == 'jsonl':
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise ValueError('line {} is not a JSON object'.format(
+                        number))
+                yield row
+        else:
+            delimiter = '\t' if data_format == 'tsv' else ','
+            for row in csv.DictReader(f, delimiter=delimiter):
+                yield row
+
+
+def field(value):
+    return '' if value is None else str(value)
+
+
+def parse_row(machine, document, lines, offset):
+    """Return (sections, pending) parsed from template `lines` of a row.
+
+    The state `machine` is reused for every row, since building it takes
+    longer than parsing a small template.  The references of the row are
+    resolved against its own targets, footnotes, and citations.
+    """
+    row_document = new_document(document['source'], document.settings)
+    machine.observers = []  # note_source of the previous row
+    machine.run(lines, row_document, input_offset=offset)
+    if any(isinstance(node, reference_nodes)
+           for node in row_document.findall()):
+        for transform in row_transforms:
+            transform(row_document).apply()
+    sections = []
+    for child in row_document.children:
+        if isinstance(child, nodes.section):
+            sections.append(child)
+        elif not isinstance(child, (nodes.Invisible, nodes.system_message)):
+            raise ValueError('template must consist of sections')
+    pending = [(node, int(priority.split('-')[0])) for priority, _, node, _
+               in row_document.transformer.transforms if node is not None]
+    for section in sections:
+        detach(section)
+    return sections, pending
+
+
+def adopt_row(document, sections, pending, index):
+    """Insert the `sections` of one row into `document` at `index`.
+
+    The ids of the row are renumbered to be unique in `document`, and the
+    references which point to them follow.  Only the section titles are
+    registered as names, since the other names of the row are local to it;
+    references the row did not resolve are noted for the transforms of
+    `document`.
+    """
+    old_ids, refs = [], []
+    for section in sections:
+        for element in section.findall(nodes.Element):
+            if element['ids']:
+                old_ids.append((element, element['ids']))
+                element['ids'] = []
+            if not isinstance(element, nodes.section):
+                element['names'] = []
+            if ('refid' in element or 'refname' in element or
+                    element.get('backrefs')):
+                refs.append(element)
+    for i, section in enumerate(sections):
+        adopt(document, document, section, index=index + i)
+    new_ids = {}
+    for element, ids in old_ids:
+        if not element['ids']:
+            document.set_id(element)
+        for id in ids:
+            new_ids[id] = element['ids'][0]
+    for element in refs:
+        if 'refid' in element:
+            element['refid'] = new_ids.get(element['refid'], element['refid'])
+        if element.get('backrefs'):
+            element['backrefs'] = [new_ids.get(id, id)
+                                   for id in element['backrefs']]
+        if 'refname' not in element or getattr(element, 'resolved', 0):
+            continue
+        if isinstance(element, nodes.footnote_reference):
+            document.note_footnote_ref(element)
+        elif isinstance(element, nodes.citation_reference):
+            document.note_citation_ref(element)
+        else:
+            document.note_refname(element)
+    for pending_node, priority in pending:
+        document.note_pending(pending_node, priority)
+
+
+def cache_path(path, site, key):
+    """Return cache file for data file `path`, directive `site`, and `key`.
+
+    The `site` distinguishes directives using the same data file.
+    """
+    top, name = os.path.split(path)
+    return os.path.join(top, cache_dir, '{}-{}-{}.pickle'.format(
+        name, site[:8], key[:16]))
+
+
+def signing_key():
+    """Return the secret key signing cache files, or None.
+
+    The key is created, readable only by the user, on first use.
+    """
+    path = os.path.expanduser(key_file)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except OSError:
+        pass  # exists, or cannot be made
+    else:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(os.urandom(32))
+    try:
+        with open(path, 'rb') as f:
+            key = f.read()
+    except OSError:
+        return None
+    return key if len(key) == 32 else None
+
+
+def signature(secret, data):
+    return hmac.new(secret, data, sha256).digest()
+
+
+def load_cache(path, site, key):
+    """Return (dependencies, slides) cached for `key`, or None.
+
+    The dependencies map the files the rows pulled in to their digests.
+    """
+    secret = signing_key()
+    if secret is None:
+        return None
+    try:
+        with open(cache_path(path, site, key), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    size = len(signature(secret, b''))
+    if not hmac.compare_digest(data[:size], signature(secret, data[size:])):
+        return None  # not written by this user, or damaged
+    try:
+        cached_key, dependencies, slides = pickle.loads(data[size:])
+    except Exception:  # written by another version
+        return None
+    if cached_key != key:
+        return None
+    for dependency, digest in dependencies.items():
+        current = file_digest(dependency)
+        if (current.hex() if current else None) != digest:
+            return None
+    return dependencies, slides
+
+
+def save_cache(path, site, key, dependencies, slides):
+    """Write `slides` to the cache, removing older entries for `site`."""
+    secret = signing_key()
+    if secret is None:
+        return
+    target = cache_path(path, site, key)
+    top, name = os.path.split(target)
+    prefix = name[:-len(key[:16]) - len('.pickle')]
+    data = pickle.dumps((key, dependencies, slides), pickle.HIGHEST_PROTOCOL)
+    try:
+        if not os.path.isdir(top):
+            os.makedirs(top)
+        replace_file(target, signature(secret, data) + data)
+        for old in os.listdir(top):
+            if (old.startswith(prefix) and old != name and
+                    len(old) == len(name)):
+                os.remove(os.path.join(top, old))
+    except OSError:
+        pass  # read-only data directory, say
+
+
+class DataSlidesDirective(Directive):
+    """Expand an rst template into slides for every row of a data file."""
+    required_arguments = 1
+    optional_arguments = 0
+    final_argument_whitespace = True
+    has_content = True
+    option_spec = {'format': choice_validator(['csv', 'tsv', 'jsonl']),
+                   'encoding': directives.encoding}
+
+    def run(self):
+        document = self.state.document
+        settings = document.settings
+        if not settings.file_insertion_enabled:
+            raise self.warning('"%s" directive disabled.' % self.name)
+        if not self.content:
+            raise self.error('"%s" directive requires a template.'
+                             % self.name)
+        source_dir = os.path.dirname(os.path.abspath(
+            document.current_source or '.'))
+        path = os.path.normpath(os.path.join(
+            source_dir, directives.path(self.arguments[0])))
+        path = utils.relative_path(None, path)
+        data_format = self.options.get('format') or data_formats.get(
+            os.path.splitext(path)[1].lower())
+        if not data_format:
+            raise self.error('"%s" directive cannot tell the format of '
+                             '"%s", use the format option.'
+                             % (self.name, path))
+        encoding = (self.options.get('encoding') or settings.input_encoding
+                    or 'utf-8-sig')
+        digest = file_digest(path)
+        if digest is None:
+            raise self.severe('"%s" directive cannot read "%s".'
+                              % (self.name, path))
+        settings.record_dependencies.add(path)
+        template = '\n'.join(self.content)
+        site = sha256(json.dumps([document['source'], template]).encode(
+            'utf-8')).hexdigest()
+        key = sha256(json.dumps([
+            cache_version, site, digest.hex(), self.content_offset,
+            data_format, encoding, settings.language_code, settings.tab_width,
+            docutils.__version__]).encode('utf-8')).hexdigest()
+        cached = load_cache(path, site, key)
+        if cached is None:
+            known = set(settings.record_dependencies.list)
+            slides = self.expand(path, data_format, encoding)
+            dependencies = {}
+            for dependency in settings.record_dependencies.list:
+                if dependency not in known:
+                    digest = file_digest(dependency)
+                    dependencies[dependency] = digest and digest.hex()
+            save_cache(path, site, key, dependencies, slides)
+        else:
+            dependencies, slides = cached
+            for dependency in dependencies:
+                settings.record_dependencies.add(dependency)
+        pending = nodes.pending(DataSlides, {'slides': slides},
+                                self.block_text)
+        document.note_pending(pending)
+        return [pending]
+
+    def expand(self, path, data_format, encoding):
+        """Return list of (sections, pending) for the rows in `path`."""
+        tab_width = self.state.document.settings.tab_width
+        # Substitute line by line, so that every line of a row keeps the
+        # source line of its template line for system messages.
+        templates = [(RowTemplate(line), source, offset) for line,
+                     (source, offset) in zip(self.content,
+                                             self.content.items)]
+        machine = states.RSTStateMachine(state_classes=states.state_classes,
+                                         initial_state='Body')
+        rows = []
+        try:
+            for number, row in enumerate(
+                    read_rows(path, data_format, encoding), 1):
+                fields = {key: field(value) for key, value in row.items()}
+                lines = StringList()
+                for template, source, offset in templates:
+                    try:
+                        text = template.substitute(fields)
+                    except KeyError as e:
+                        raise ValueError('row {}: no field {}'.format(
+                            number, e))
+                    for line in string2lines(text, tab_width=tab_width,
+                                             convert_whitespace=True) or ['']:
+                        lines.append(line, source, offset)
+                rows.append(parse_row(machine, self.state.document, lines,
+                                      self.content_offset))
+        except (OSError, ValueError, csv.Error) as e:
+            raise self.error('"%s" directive, %s: %s' % (self.name, path, e))
+        return rows
+
+
+class DataSlides(Transform):
+    """Move the slides of a data-slides directive to the top level."""
+    # After DocTitle (320), which makes the title page the document, and
+    # before the background, transition, and reveal-state transforms in the
+    # slides run.
+    default_priority = 400
+
+    def apply(self):
+        pending = self.startnode
+        document = self.document
+        rows = pending.details['slides']
+        node = pending
+        while node.parent is not document:
+            node = node.parent
+        pending.parent.remove(pending)
+        if isinstance(node, nodes.section):
+            index = document.index(node) + 1
+        else:  # title page
+            index = len(document.children)
+            for i, child in enumerate(document.children):
+                if isinstance(child, nodes.section):
+                    index = i
+                    break
+        for sections, notes in rows:
+            adopt_row(document, sections, notes, index)
+            index += len(sections)
@@ -0,0 +1,123 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Record the input files of a presentation for incremental builds.
+
+The inputs of a presentation are its rst source, files pulled in by include
+directives (and anything else docutils records with its
+``--record-dependencies`` option), local image files, local video and
+background image files, and local stylesheets, including css/custom.css and
+stylesheets set by the configure directive.  Paths are relative to the
+current directory, like docutils dependency paths.  Image, video,
+background, and stylesheet urls are resolved relative to the output file,
+as the browser resolves them, and stylesheet paths as the writer does,
+relative to the current directory or the stylesheet directories.
+
+With the ``--depfile=FILE`` writer option, the inputs are written to FILE
+as a Make (or Ninja) rule for the output (and any ``--variant`` outputs)::
+
+    presentation.html: presentation.rst image/titlepage.png css/custom.css
+
+where the output is ``-`` when the presentation goes to standard output.
+
+With ``--dependency-manifest=FILE``, they are written as JSON with the
+content hash of every input, so that a build system can decide whether the
+presentation is stale without parsing it::
+
+    {"outputs": ["presentation.html"],
+     "dependencies": {"presentation.rst": "3f2a6c01be...", ...}}
+
+"""
+
+import json
+import os
+import os.path
+
+from docutils import nodes, utils
+
+from .assets import is_remote, file_hash
+
+
+def local_file(uri, base_dir=''):
+    """Return path of the local file `uri` relative to `base_dir`, or None."""
+    if not uri or is_remote(uri):
+        return None
+    path = os.path.normpath(os.path.join(
+        base_dir, uri.split('#', 1)[0].split('?', 1)[0]))
+    return path if os.path.isfile(path) else None
+
+
+def media_uris(node):
+    """Yield (element, uri) of images, videos, and backgrounds in `node`."""
+    for element in node.findall(nodes.Element):
+        if isinstance(element, nodes.image):
+            yield element, element['uri']
+        elif isinstance(element, nodes.raw) and element.get('uri'):
+            yield element, element['uri']  # video directive
+        attribs = getattr(element, 'reveal_data_attribs', None)
+        if attribs and 'data-background-image' in attribs:
+            yield element, attribs['data-background-image']
+
+
+def dependencies(document, destination_path=None):
+    """Return sorted list of the local input files of `document`.
+
+    Urls in the presentation are relative to the directory of its output
+    file `destination_path` (or the current directory).
+    """
+    settings = document.settings
+    html_dir = os.path.dirname(destination_path or '')
+    found = set()
+    source = getattr(settings, '_source', None) or document.get('source')
+    for path in [source] + list(settings.record_dependencies.list):
+        if path and os.path.isfile(path):
+            found.add(os.path.normpath(path))
+    for _, uri in media_uris(document):
+        path = local_file(uri, html_dir)
+        if path:
+            found.add(path)
+    for setting in ('stylesheet_path', 'stylesheet'):
+        sheets = getattr(settings, setting, None) or []
+        if not isinstance(sheets, list):
+            sheets = sheets.split(',')
+        for sheet in sheets:
+            sheet = sheet.strip()
+            if setting == 'stylesheet':
+                path = local_file(sheet, html_dir)
+            else:
+                path = local_file(utils.find_file_in_dirs(
+                    sheet, settings.stylesheet_dirs))
+            if path:
+                found.add(path)
+    for path in found:
+        settings.record_dependencies.add(path)
+    return sorted(found)
+
+
+def make_escape(path):
+    return path.replace('\\', '/').replace(' ', '\\ ').replace('$', '$$')
+
+
+def write_depfile(path, outputs, deps):
+    """Write Make format rule for `outputs` depending on `deps` to `path`."""
+    with open(path, 'w') as f:
+        f.write(' '.join(make_escape(output) for output in outputs) + ':')
+        for dep in deps:
+            f.write(' \\\n  ' + make_escape(dep))
+        f.write('\n')
+
+
+def write_dependency_manifest(path, outputs, deps):
+    """Write JSON dependency manifest with content hashes to `path`."""
+    manifest = {'outputs': outputs,
+                'dependencies': {dep: file_hash(dep, 64) for dep in deps}}
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+        f.write('\n')
@@ -162,6 +162,21 @@ def validate_ternary(argument):
         return argument
 
 
+# Optional reveal.js plugins the reveal directive plugins option may force,
+# see HTMLTranslator.detect_plugins.
+reveal_plugins = ('markdown', 'highlight', 'notes', 'zoom', 'search')
+
+
+def validate_plugins(argument):
+    """Convert comma separated reveal.js plugin names to a list."""
+    names = [name.strip().lower() for name in argument.split(',')
+             if name.strip()]
+    for name in names:
+        if name not in reveal_plugins:
+            raise ValueError('unknown reveal.js plugin "%s"' % name)
+    return names
+
+
 _booleans = {'0': False, '1': True, 'no': False, 'yes': True,
              'false': False, 'true': True}
 
@@ -183,8 +198,8 @@ class VideoDirective(Directive):
         href = directives.uri(self.arguments[0])
         codec = href.rsplit('.', 1)[-1].lower()
         if codec not in ['mp4', 'webm', 'ogg', 'ogv']:
-            self.error("Error in directive: the video must be in .mp4, .webm, "
-                       ".ogg, or .ogv format.")
+            raise self.error("Error in directive: the video must be in .mp4, "
+                             ".webm, .ogg, or .ogv format.")
         args = dict(align='center', width='50%', controls='controls',
                     autoplay='', loop='', href=href, codec=codec)
         opts = self.options
@@ -194,7 +209,9 @@ class VideoDirective(Directive):
             else:
                 opts[opt] = value.strip()
         args.update(opts)
-        return [nodes.raw('video', VIDEO_TAG % args, format='html')]
+        # uri records the video file for dependency tracking
+        return [nodes.raw('video', VIDEO_TAG % args, format='html',
+                          uri=href)]
 
 
 # Is the outer div really necessary?  Why not add class to video tag?
@@ -238,10 +255,18 @@ class ConfigureDirective(Directive):
         'cloak_email_addresses': validate_boolean
         }
 
+    # Options which cause the writer to read files.
+    file_options = ('template', 'stylesheet', 'stylesheet_path',
+                    'stylesheet_dirs', 'embed_stylesheet')
+
     def run(self):
         document = self.state_machine.document
         settings = document.settings
         for setting, value in self.options.items():
+            if (setting in self.file_options and
+                    not settings.file_insertion_enabled):
+                raise self.warning('"%s" option disabled for "%s" directive.'
+                                   % (setting, self.name))
             if setting == 'title':
                 document['title'] = value
             setattr(settings, setting, value)
@@ -304,7 +329,9 @@ class RevealDirective(Directive):
         # following added for reveal.js theme and highlight.js style
         'theme': directives.unchanged_required,
         'highlightstyle': directives.unchanged_required,
-        'revealpath': directives.unchanged_required
+        'revealpath': directives.unchanged_required,
+        # plugins to load even if the presentation does not need them
+        'plugins': validate_plugins
         }
     # Docutils field list options froced to lower case.  Put them back.
     camel_case = {
@@ -332,35 +359,85 @@ class RevealDirective(Directive):
         'maxscale': 'maxScale'
         }
 
+    # Options which choose scripts the page loads or runs.
+    script_options = ('autoslidemethod', 'mathjax', 'mathjaxconfig',
+                      'revealpath')
+
     def run(self):
         document = self.state_machine.document
-        opts = {self.camel_case.get(opt, opt): value
-                for opt, value in self.options.items()}
-        document.reveal = opts
-        document.mathjax = mathjax_default.copy()
-        document.reveal_dir = path = opts.pop('revealpath', REVEAL_DIR)
-        mathjax = glob(os.path.join(path, 'MathJax*'))
-        if mathjax:
-            mathjax.sort()
-            document.mathjax['mathjax'] = mathjax[-1]
-        for key, nm in [('mathjax', 'mathjax'), ('mathjaxconfig', 'config')]:
-            v = opts.pop(key, None)
-            if v:
-                document.mathjax[nm] = v
-        theme = opts.pop('theme', '').strip()
-        if theme:
-            document.theme = theme
-        style = opts.pop('highlightstyle', '').strip()
-        if style:
-            document.hljs = style
+        settings = document.settings
+        if not (settings.raw_enabled and settings.file_insertion_enabled):
+            for option in self.script_options:
+                if option in self.options:
+                    raise self.warning('"%s" option disabled for "%s" '
+                                       'directive.' % (option, self.name))
+        apply_reveal_options(document, self.options)
         return []
 
 
+def apply_reveal_options(document, options, merge=False):
+    """Set validated reveal directive `options` for `document`.
+
+    Options replace those of any previous reveal directive, unless `merge`
+    is true, in which case they override only the options they name.
+    """
+    opts = {RevealDirective.camel_case.get(opt, opt): value
+            for opt, value in options.items()}
+    if merge:
+        opts = dict(getattr(document, 'reveal', {}), **opts)
+        document.mathjax = getattr(document, 'mathjax',
+                                   mathjax_default).copy()
+    else:
+        document.mathjax = mathjax_default.copy()
+    document.reveal = opts
+    path = opts.pop('revealpath', None)
+    if path:
+        document.reveal_dir = path
+    else:
+        path = getattr(document, 'reveal_dir', None) or getattr(
+            document.settings, 'reveal_dir', REVEAL_DIR)
+    mathjax = glob(os.path.join(path, 'MathJax*'))
+    if mathjax:
+        mathjax.sort()
+        document.mathjax['mathjax'] = mathjax[-1]
+    for key, nm in [('mathjax', 'mathjax'), ('mathjaxconfig', 'config')]:
+        v = opts.pop(key, None)
+        if v:
+            document.mathjax[nm] = v
+    theme = opts.pop('theme', '').strip()
+    if theme:
+        document.theme = theme
+    style = opts.pop('highlightstyle', '').strip()
+    if style:
+        document.hljs = style
+    plugins = opts.pop('plugins', None)
+    if plugins:
+        document.reveal_plugins = plugins
+
+
+def parse_reveal_options(text):
+    """Return validated reveal directive options from "opt=value,..."."""
+    options = {}
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        opt, _, value = item.partition('=')
+        opt = opt.strip().lower()
+        validator = RevealDirective.option_spec.get(opt)
+        if validator is None:
+            raise ValueError('unknown reveal option "%s"' % opt)
+        try:
+            options[opt] = validator(value.strip())
+        except (ValueError, LookupError) as e:
+            raise ValueError('reveal option "%s": %s' % (opt, e))
+    return options
+
+
 mathjax_default = {
     'mathjax': 'https://cdnjs.cloudflare.com/ajax/libs/'
                'mathjax/2.7.0/MathJax.js',
     'config': 'TeX-AMS_HTML-full'}
-REVEAL_DIR = 'ui'  # overwritten to make consistent
+REVEAL_DIR = 'ui'  # default reveal.js path, see revealPath option
 
 
 class BackgroundDirective(Directive):
@@ -392,9 +469,12 @@ class BackgroundDirective(Directive):
             details.update(image=bg, **self.options)
         else:  # argument does not look like an image URL, assume a color
             if self.options:
-                self.error("color background directive accepts no options")
+                raise self.error(
+                    "color background directive accepts no options")
             details.update(color=bg)
         pending = nodes.pending(BackgroundAttribute, details, self.block_text)
+        pending.source, pending.line = self.state_machine.get_source_and_line(
+            self.lineno)
         self.state_machine.document.note_pending(pending)
         return [pending]
 
@@ -433,6 +513,8 @@ class BackgroundAttribute(Transform):
             return
         parent = pending.parent
         parent.remove(pending)
+        if image:  # for diagnostics about the image, see rst2slides.check
+            parent.background_location = pending.source, pending.line
         attribs = getattr(parent, 'reveal_data_attribs', None)
         if attribs is None:
             parent.reveal_data_attribs = atts
@@ -450,7 +532,7 @@ class TransitionDirective(Directive):
     def run(self):
         style = self.arguments[0].strip().lower()
         if style not in self.styles:
-            self.error("unrecognized reveal.js transition %s".format(style))
+            raise self.error("unrecognized reveal.js transition %s" % style)
         details = dict(directive=self.name, style=style)
         details.update(self.options)
         pending = nodes.pending(TransitionAttribute, details, self.block_text)
@@ -625,4 +707,6 @@ class HLjsCodeBlock(CodeBlock):
             nodes[0].attributes['data-trim'] = 'true'
         if noescape is not Ellipsis:
             nodes[0].attributes['data-noescape'] = 'true'
+        # The language argument, for the --hljs-subset writer option.
+        nodes[0].code_language = self.arguments[0] if self.arguments else ''
         return nodes
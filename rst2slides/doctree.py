@@ -0,0 +1,102 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Walk a presentation doctree slide by slide.
+
+Each reveal.js slide is identified by its horizontal and vertical indices
+(h, v), which are the numbers in #/h/v presentation urls.  The title page,
+if the document has a title, is slide (0, 0).  Each top-level section is a
+horizontal slide, and its subsections, if any, are vertical slides below
+it.  Sections made by the aside directive are speaker notes, not slides.
+
+The `detach` and `adopt` functions move subtrees parsed in one document
+(in a worker process, for example) into another.
+
+"""
+
+from docutils import nodes
+
+
+def is_slide(node):
+    return (isinstance(node, nodes.section) and
+            not hasattr(node, 'aside_section'))
+
+
+def iter_slides(document):
+    """Yield (h, v, node) for every slide of `document`.
+
+    The node of the title page is the document itself.
+    """
+    h = 0
+    if any(isinstance(child, nodes.title) for child in document.children):
+        yield 0, 0, document
+        h = 1
+    for section in document.children:
+        if not is_slide(section):
+            continue
+        yield h, 0, section
+        subslides = [child for child in section.children if is_slide(child)]
+        for v, subslide in enumerate(subslides):
+            yield h, v + 1, subslide
+        h += 1
+
+
+def slide_content(node):
+    """Return children of slide `node`, omitting its vertical subslides."""
+    if isinstance(node, nodes.document) or isinstance(node.parent,
+                                                      nodes.document):
+        return [child for child in node.children if not is_slide(child)]
+    return list(node.children)
+
+
+def slide_title(node):
+    """Return title text of slide `node`, or the empty string."""
+    for child in node.children:
+        if isinstance(child, nodes.title):
+            return child.astext()
+    return ''
+
+
+def slide_id(node):
+    """Return the html id of slide `node`, or None."""
+    if isinstance(node, nodes.document) or not node['ids']:
+        return None
+    return node['ids'][0]
+
+
+def detach(node):
+    """Detach `node` from its parent and document, for pickling.
+
+    Nodes parsed in one document (in a worker process, say) may be moved
+    into another with `adopt`.
+    """
+    node.parent = None
+    for element in node.findall():
+        element.document = None
+
+
+def adopt(document, parent, node, pending=(), index=None):
+    """Append detached `node` to `parent` in `document`.
+
+    Register the ids and names of the titled sections in `node`, as the
+    parser would have, and note the (pending node, priority) transforms
+    in `pending`.  With an `index`, insert `node` there instead.
+    """
+    if index is None:
+        parent.append(node)
+    else:
+        parent.insert(index, node)
+    for element in node.findall():
+        element.document = document
+    for section in node.findall(nodes.section):
+        if section['names']:
+            document.note_implicit_target(section, section)
+    for pending_node, priority in pending:
+        document.note_pending(pending_node, priority)
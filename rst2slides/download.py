@@ -29,38 +29,117 @@ compatibility, and fails to produce bold or italic highlights.
 
 This module can be run as a script to download reveal.js and/or MathJax::
 
-    python -m rst2slides.download [path] [-m [mathjax_tag]]
+    python -m rst2slides.download [path] [-m [mathjax_tag]] [--full-mathjax]
 
 The default path is 'ui' in the current working directory; reveal.js will
 be downloaded to the specified path, and the eight highlight.js css styles
 will be copied to path/hljs/.  If the -m flag is specified, MathJax will
 be downloaded to path/MathJax-master/ or to path/MathJax-tag if the mathjax
-tag is specified.
+tag is specified.  The local copy of MathJax omits its uncompressed
+sources, image fonts, and fonts other than TeX, which rst2slides does not
+use (see rst2slides.mathconfig), unless the --full-mathjax flag is given.
+
+Concurrent builds (make -j, say) may share one reveal.js directory.  Setup
+holds an inter-process lock (the .ui.lock file beside ui) while it
+installs, and reveal.js and MathJax are extracted to temporary directories
+and renamed into place, so other builds wait for a single installer and
+never see a partial copy.
 
 """
 
 import os
 import os.path
+import shutil
 import sys
+import tempfile
+import time
+from contextlib import contextmanager
 from io import BytesIO
 from zipfile import ZipFile
 from glob import glob
 
+from .output import replace_file
+
 if sys.version_info < (3,):
     from urllib2 import urlopen
     input = raw_input
 else:
     from urllib.request import urlopen
 
-
-def setup(path='ui', math='master'):
-    if not os.path.exists(os.path.join(path, 'js', 'reveal.js')):
-        download_reveal(path)
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def makedirs(path):
+    """Create directory `path`, which another process may also create."""
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+
+
+@contextmanager
+def install_lock(path):
+    """Hold an exclusive inter-process lock for installing into `path`.
+
+    The lock file is .<name>.lock beside `path`, so that concurrent builds
+    sharing one reveal.js directory wait for a single installer.
+    """
+    top, name = os.path.split(os.path.normpath(path))
+    if top:
+        makedirs(top)
+    with open(os.path.join(top, '.{}.lock'.format(name)), 'a') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # gives up after 10 seconds
+                    time.sleep(1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def install_file(path, text, if_changed=False):
+    """Write `text` to `path` atomically, so readers never see part of it.
+
+    If `if_changed`, leave `path` alone when it already holds `text`.
+    """
+    dest = os.path.dirname(path)
+    if dest:
+        makedirs(dest)
+    replace_file(path, text.encode('utf-8'), if_changed=if_changed)
+
+
+def is_setup(path, math):
     hljs = os.path.join(path, 'hljs')
-    if not os.path.exists(hljs):
-        copy_hljs_styles(hljs)
-    if math and not glob(os.path.join(path, 'MathJax*')):
-        download_mathjax(path, math)
+    return (os.path.exists(os.path.join(path, 'js', 'reveal.js')) and
+            all(os.path.exists(os.path.join(hljs, style + '.css'))
+                for style in hljs_styles) and
+            not (math and not glob(os.path.join(path, 'MathJax*'))))
+
+
+def setup(path='ui', math='master', prune=True):
+    if is_setup(path, math):
+        return
+    with install_lock(path):
+        # Another process may have installed while this one waited.
+        if not os.path.exists(os.path.join(path, 'js', 'reveal.js')):
+            download_reveal(path)
+        copy_hljs_styles(os.path.join(path, 'hljs'))
+        if math and not glob(os.path.join(path, 'MathJax*')):
+            download_mathjax(path, math, prune)
 
 
 def download_reveal(path, tag='master'):
@@ -68,21 +147,59 @@ def download_reveal(path, tag='master'):
     # rst2slides built at tag 3.6.0
     print('Downloading reveal.js...')
     top = os.path.dirname(path)
-    ZipFile(BytesIO(urlopen(url).read())).extractall(top or None)
-    if os.path.exists(path):
-        old, i = path + '-old', 0
-        while os.path.exists(old):
-            old, i = path + '-old{}'.format(i), i + 1
-        os.rename(path, old)
-    os.rename(os.path.join(top, 'reveal.js-{}'.format(tag)), path)
+    # Extract beside path, then rename into place, so that path is never
+    # a partial copy.
+    tmp = tempfile.mkdtemp(prefix='.reveal.js-', dir=top or None)
+    try:
+        ZipFile(BytesIO(urlopen(url).read())).extractall(tmp)
+        if os.path.exists(path):
+            old, i = path + '-old', 0
+            while os.path.exists(old):
+                old, i = path + '-old{}'.format(i), i + 1
+            os.rename(path, old)
+        os.rename(os.path.join(tmp, 'reveal.js-{}'.format(tag)), path)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
     print('Done')
 
 
-def download_mathjax(path, tag='master'):
+# Parts of the MathJax distribution rst2slides never loads: uncompressed
+# sources, tests, image fonts, and font families other than TeX.  Together
+# they are most of its size.
+mathjax_pruned = ('unpacked/', 'test/', 'docs/', 'fonts/HTML-CSS/TeX/png/',
+                  'fonts/HTML-CSS/TeX/eot/', 'fonts/HTML-CSS/TeX/svg/')
+mathjax_fonts = ('Asana-Math', 'Gyre-Pagella', 'Gyre-Termes', 'Latin-Modern',
+                 'Neo-Euler', 'STIX-Web')
+
+
+def mathjax_member_pruned(name):
+    """Is zip member `name` (in the MathJax-tag/ directory) pruned?"""
+    name = name.split('/', 1)[-1]
+    if name.startswith(mathjax_pruned):
+        return True
+    return any('fonts/{}/'.format(family) in name
+               for family in mathjax_fonts)
+
+
+def download_mathjax(path, tag='master', prune=True):
     url = 'https://github.com/mathjax/MathJax/archive/{}.zip'.format(tag)
     # rst2slides built at tag 2.7.4
     print('Downloading MathJax...')
-    ZipFile(BytesIO(urlopen(url).read())).extractall(path)
+    archive = ZipFile(BytesIO(urlopen(url).read()))
+    members = archive.namelist()
+    if prune:
+        members = [name for name in members
+                   if not mathjax_member_pruned(name)]
+    # As for reveal.js, a partial MathJax-tag directory is never visible.
+    makedirs(path)
+    tmp = tempfile.mkdtemp(prefix='.MathJax-', dir=path)
+    try:
+        archive.extractall(tmp, members)
+        name = 'MathJax-{}'.format(tag)
+        if not os.path.exists(os.path.join(path, name)):
+            os.rename(os.path.join(tmp, name), os.path.join(path, name))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
     print('Done')
 
 
@@ -90,14 +207,11 @@ def copy_hljs_styles(dest):
     """Copy four light and four dark highlight.js styles to `dest`."""
     if not dest.endswith('hljs'):
         dest = os.path.join(dest, 'hljs')
-    if not os.path.isdir(dest):
-        os.mkdir(dest)
     for style in hljs_styles:
         path = os.path.join(dest, style + '.css')
         if os.path.isfile(path):
             continue
-        with open(path, 'w') as f:
-            f.write(hljs_styles[style])
+        install_file(path, hljs_styles[style])
 
 
 hljs_styles = {
@@ -851,11 +965,15 @@ if __name__ == '__main__':
     args = sys.argv[1:]
     math = False
     if '-h' in args or '--help' in args:
-        print('Usage: python -m rst2slides.download [path] [-m [mathjax_tag]]')
+        print('Usage: python -m rst2slides.download [path] [-m [mathjax_tag]] '
+              '[--full-mathjax]')
         sys.exit(0)
+    prune = '--full-mathjax' not in args
+    if not prune:
+        args.remove('--full-mathjax')
     if '-m' in args:
         i = args.index('-m')
         math = args[i+1] if len(args) > i+1 else 'master'
         del args[i:]
     path = args[0] if args else 'ui'
-    setup(path, math)
+    setup(path, math, prune)
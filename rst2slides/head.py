@@ -0,0 +1,148 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Shorten the critical path to the first slide.
+
+With the ``--optimized-head`` writer option, the head of the presentation
+starts with ``<link rel="preload">`` hints for the reveal.js script, the
+first slide background image, and the fonts of the theme, so the browser
+fetches them while it is still parsing the stylesheets.  The print
+stylesheet is an ordinary link with ``media="print"``, which does not block
+rendering, instead of a link added by an inline script in the head (which
+waits for the stylesheets before it runs).  The ``?print-pdf`` switch to
+the pdf export stylesheet moves to the end of the body.
+
+With ``--critical-css`` (which implies ``--optimized-head``), the rules of
+each local stylesheet which could match the first slide (see
+rst2slides.purge) are inlined in a ``<style>`` element in place of its
+link, and the full stylesheet is loaded without blocking rendering.
+
+The translator emits the preload hints it knows from the doctree; the
+theme fonts and critical CSS need the stylesheet files, which are found
+relative to the output file after translation.
+
+"""
+
+import os.path
+import re
+
+from .assets import is_remote, css_url, css_import
+from .purge import vocabulary, purge_css, rebase_urls, css_rules
+
+_comment = re.compile(r'/\*.*?\*/', re.S)
+_stylesheet = re.compile(r'<link rel="stylesheet" href="([^"]+)"([^>]*?)'
+                         r'\s*/?>')
+_theme = re.compile(r'<link rel="stylesheet" href="([^"]+)" id="theme">')
+# Font formats to preload, in order of preference.
+font_types = [('.woff2', 'font/woff2'), ('.woff', 'font/woff'),
+              ('.ttf', 'font/ttf'), ('.otf', 'font/otf')]
+font_preload = ('<link rel="preload" href="{}" as="font" type="{}" '
+                'crossorigin>\n')
+
+
+def best_font(urls):
+    """Return (url, type) of the preferred font format in `urls`, or None."""
+    for suffix, mime in font_types:
+        for url in urls:
+            if url.split('?', 1)[0].split('#', 1)[0].lower().endswith(suffix):
+                return url, mime
+    return None
+
+
+def stylesheet_fonts(path, seen=None):
+    """Return [(path, type)] of local fonts of @font-face rules in `path`.
+
+    Follows local @import rules.
+    """
+    seen = set() if seen is None else seen
+    if path in seen or not os.path.isfile(path):
+        return []
+    seen.add(path)
+    with open(path, 'rb') as f:
+        css = _comment.sub('', f.read().decode('utf-8', 'replace'))
+    css_dir = os.path.dirname(path)
+    fonts = []
+    for prelude, body in css_rules(css):
+        if body is None:
+            urls = ([url for _, _, url in css_import.findall(prelude)] +
+                    [url for _, url in css_url.findall(prelude)])
+            for url in urls:
+                if not is_remote(url):
+                    fonts.extend(stylesheet_fonts(
+                        os.path.normpath(os.path.join(css_dir, url)), seen))
+        elif prelude.lower().startswith('@font-face'):
+            font = best_font([url for _, url in css_url.findall(body)])
+            if font and not is_remote(font[0]):
+                font_path = os.path.normpath(os.path.join(css_dir, font[0]))
+                if os.path.isfile(font_path):
+                    fonts.append((font_path, font[1]))
+    return fonts
+
+
+def preload_fonts(html, html_dir):
+    """Add preload hints for the local fonts of the theme to `html`."""
+    html_dir = html_dir or os.curdir
+    match = _theme.search(html)
+    if not match or is_remote(match.group(1)):
+        return html
+    fonts = stylesheet_fonts(os.path.join(html_dir, match.group(1)))
+    if not fonts:
+        return html
+    hints = ''.join(font_preload.format(
+        os.path.relpath(path, html_dir).replace(os.sep, '/'), mime)
+        for path, mime in fonts)
+    i = _stylesheet.search(html).start()
+    return html[:i] + hints + html[i:]
+
+
+def first_slide(html):
+    """Return html of the first slide in presentation `html`."""
+    start = html.find('<div class="slides">')
+    stop = html.find('</section>', start)
+    if start < 0 or stop < 0:
+        return html
+    return html[start:stop]
+
+
+def inline_critical_css(html, html_dir):
+    """Inline the rules of local stylesheets the first slide needs.
+
+    Each local stylesheet link in `html` (other than media-specific ones)
+    is replaced by a style element with the rules which could match the
+    first slide, followed by a preload link which applies the full
+    stylesheet once it loads.
+    """
+    html_dir = html_dir or os.curdir
+    vocab = vocabulary(first_slide(html))
+
+    def inline(match):
+        href, attributes = match.groups()
+        src = os.path.join(html_dir, href)
+        if is_remote(href) or 'media=' in attributes or not os.path.isfile(
+                src):
+            return match.group(0)
+        with open(src, 'rb') as f:
+            css = purge_css(f.read().decode('utf-8'), vocab)
+        css = rebase_urls(css, os.path.dirname(src), html_dir).strip()
+        return ('<style>\n{0}\n</style>\n'.format(css) if css else '') + (
+                '<link rel="preload" href="{0}" as="style"{1} '
+                'onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+                '<noscript><link rel="stylesheet" href="{0}"></noscript>'
+                ''.format(href, attributes))
+
+    return _stylesheet.sub(inline, html)
+
+
+def optimize_head(html, html_dir, critical_css=False):
+    """Return `html` with font preloads and optionally critical CSS."""
+    html = preload_fonts(html, html_dir)
+    if critical_css:
+        html = inline_critical_css(html, html_dir)
+    return html
@@ -0,0 +1,162 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Build a highlight.js plugin with only the languages a presentation uses.
+
+The reveal.js highlight plugin, plugin/highlight/highlight.js, bundles the
+highlight.js core with the grammar of every language it supports, each
+registered by a ``hljs.registerLanguage("name", function(...){...})``
+call.  With the ``--hljs-subset`` writer option, the bundle is split at
+those calls, and a copy keeping only the grammars of the languages named
+by code directives in the presentation (and the grammars they embed as
+sub-languages, like css and javascript in xml) is written to::
+
+    <reveal_dir>/plugin/highlight/highlight-<hash>.js
+
+where the hash covers the original bundle and the language set, so any
+presentation with the same languages reuses the file.  The last grammar of
+the bundle is always kept, since it runs to the end of the file.
+
+The copy also restricts highlight.js auto-detection, which it applies to
+code blocks without a language it knows, to the languages the presentation
+uses.
+Blocks whose explicit language highlight.js does not know at all get the
+nohighlight class, so they are not auto-detected.  If the bundle cannot be
+split, or with ``--no-download`` if the copy has not been written before,
+the presentation uses it unchanged.
+
+"""
+
+import json
+import os.path
+import re
+from hashlib import sha1
+
+from docutils import nodes
+
+from .download import install_file
+
+bundle_name = os.path.join('plugin', 'highlight', 'highlight.js')
+_register = re.compile(r'\w+\.registerLanguage\(\s*["\']([\w.+-]+)["\']\s*,')
+_aliases = re.compile(r'aliases\s*:\s*\[([^\]]*)\]')
+_sublanguage = re.compile(r'subLanguage\s*:\s*(\[[^\]]*\]|"[^"]*"|\'[^\']*\')')
+_name = re.compile(r'["\']([\w.+-]+)["\']')
+
+subset_tail = """
+// rst2slides --hljs-subset
+hljs.configure({languages: %s});
+(function() {
+    var unknown = %s;
+    var blocks = document.querySelectorAll('pre code');
+    for (var i = 0; i < blocks.length; i++) {
+        var classes = (blocks[i].parentNode.className + ' ' +
+                       blocks[i].className).toLowerCase().split(/\\s+/);
+        for (var j = 0; j < classes.length; j++) {
+            if (unknown.indexOf(classes[j]) >= 0) {
+                blocks[i].className += ' nohighlight';
+                break;
+            }
+        }
+    }
+})();
+"""
+
+
+def code_languages(document):
+    """Return sorted list of explicit languages of code blocks."""
+    languages = set()
+    for node in document.findall(nodes.literal_block):
+        language = getattr(node, 'code_language', None)
+        if language:
+            languages.add(language.lower())
+    return sorted(languages)
+
+
+def split_bundle(js):
+    """Return (core, {name: grammar}, aliases, last) of highlight.js `js`.
+
+    The `aliases` map each alias (and name) to its language name.  Raise
+    ValueError if `js` does not contain registerLanguage calls.
+    """
+    matches = list(_register.finditer(js))
+    if not matches:
+        raise ValueError('no registerLanguage calls')
+    core = js[:matches[0].start()]
+    grammars, aliases = {}, {}
+    for match, stop in zip(matches, [m.start() for m in matches[1:]] +
+                           [len(js)]):
+        name = match.group(1).lower()
+        grammars[name] = js[match.start():stop]
+        aliases[name] = name
+        found = _aliases.search(grammars[name])
+        if found:
+            for alias in _name.findall(found.group(1)):
+                aliases.setdefault(alias.lower(), name)
+    return core, grammars, aliases, matches[-1].group(1).lower()
+
+
+def sublanguages(grammar):
+    """Return names of the sub-languages `grammar` embeds."""
+    names = []
+    for value in _sublanguage.findall(grammar):
+        names.extend(name.lower() for name in _name.findall(value))
+    return names
+
+
+def subset_bundle(js, languages):
+    """Return highlight.js bundle `js` with only `languages` grammars."""
+    core, grammars, aliases, last = split_bundle(js)
+    keep = set()
+    todo = [aliases[language] for language in languages
+            if language in aliases]
+    while todo:
+        name = todo.pop()
+        if name in keep or name not in grammars:
+            continue
+        keep.add(name)
+        todo.extend(aliases.get(sub, sub) for sub in
+                    sublanguages(grammars[name]))
+    detect = sorted(keep)
+    keep.add(last)
+    unknown = sorted(language for language in languages
+                     if language not in aliases)
+    parts = [core] + [grammar for name, grammar in grammars.items()
+                      if name in keep]
+    if not parts[-1].rstrip().endswith(';'):
+        parts.append(';')
+    parts.append(subset_tail % (json.dumps(detect), json.dumps(unknown)))
+    return ''.join(parts)
+
+
+def highlight_subset(reveal_dir, languages, write=True):
+    """Return path of highlight plugin for `languages`, or None.
+
+    The path is relative to `reveal_dir`.  Return None if the reveal.js
+    highlight plugin is missing or cannot be split, or if the plugin does
+    not exist and `write` is false.
+    """
+    bundle = os.path.join(reveal_dir, bundle_name)
+    if not os.path.isfile(bundle):
+        return None
+    with open(bundle, 'rb') as f:
+        source = f.read()
+    digest = sha1(source + repr(languages).encode('utf-8')).hexdigest()[:12]
+    name = os.path.join('plugin', 'highlight', 'highlight-{}.js'.format(
+        digest))
+    path = os.path.join(reveal_dir, name)
+    if not os.path.isfile(path):
+        if not write:
+            return None
+        try:
+            js = subset_bundle(source.decode('utf-8'), languages)
+        except ValueError:
+            return None
+        install_file(path, js)
+    return name.replace(os.sep, '/')
@@ -0,0 +1,95 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Choose a MathJax configuration from the math a presentation uses.
+
+The reveal.js math plugin loads MathJax with the ``TeX-AMS_HTML-full``
+combined configuration by default, which bundles the menu, zoom, and
+accessibility extensions with MathJax itself.  Unless the reveal directive
+has a mathjaxConfig option, rst2slides instead scans the math roles and
+directives for the TeX macros and environments they use, and loads
+``TeX-AMS_HTML``, which fetches the menu and zoom code only when a reader
+uses them, followed by an in-line configuration listing just the TeX
+extensions the math needs:
+
+* the extensions MathJax would otherwise load in the middle of typesetting
+  when it meets their macros (color, cancel, mhchem, and so on), and
+* noErrors and noUndefined, as in the combined configurations.
+
+AMSmath and AMSsymbols are part of ``TeX-AMS_HTML`` itself; MathJax has no
+combined html configuration without them.
+
+The html output jax and its fonts are the same as before.
+
+"""
+
+import re
+
+from docutils import nodes
+from docutils.utils.math import unichar2tex
+
+slim_config = 'TeX-AMS_HTML'
+_macro = re.compile(r'\\([a-zA-Z]+)')
+
+# TeX extensions MathJax loads on demand when it meets these macros.
+autoload_extensions = {
+    'color': 'color', 'textcolor': 'color', 'colorbox': 'color',
+    'fcolorbox': 'color', 'definecolor': 'color',
+    'cancel': 'cancel', 'bcancel': 'cancel', 'xcancel': 'cancel',
+    'cancelto': 'cancel',
+    'ce': 'mhchem', 'pu': 'mhchem',
+    'bbox': 'bbox', 'enclose': 'enclose',
+    'href': 'HTML', 'class': 'HTML', 'style': 'HTML', 'cssId': 'HTML',
+    'unicode': 'unicode', 'verb': 'verb',
+    'newcommand': 'newcommand', 'renewcommand': 'newcommand',
+    'newenvironment': 'newcommand', 'def': 'newcommand',
+    'boldsymbol': 'boldsymbol',
+    'mathtip': 'action', 'texttip': 'action', 'toggle': 'action',
+    'begingroup': 'begingroup', 'endgroup': 'begingroup',
+    'xtwoheadrightarrow': 'extpfeil', 'xtwoheadleftarrow': 'extpfeil',
+    'xmapsto': 'extpfeil', 'xlongequal': 'extpfeil',
+    'xtofrom': 'extpfeil', 'Newextarrow': 'extpfeil'}
+
+config_script = """
+<script type="text/x-mathjax-config">
+    MathJax.Hub.Config({%s});
+</script>"""
+
+
+def tex_usage(document):
+    """Return set of macros used by math in `document`."""
+    macros = set()
+    for node in document.findall(lambda n: isinstance(
+            n, (nodes.math, nodes.math_block))):
+        code = node.astext().translate(unichar2tex.uni2tex_table)
+        macros.update(_macro.findall(code))
+    return macros
+
+
+def tex_extensions(macros):
+    """Return sorted list of TeX extension files for the `macros` used."""
+    extensions = {autoload_extensions[m] for m in macros
+                  if m in autoload_extensions}
+    extensions.update(('noErrors', 'noUndefined'))
+    return sorted(name + '.js' for name in extensions)
+
+
+def mathjax_config(document, local=False):
+    """Return (config, in-line config script) for the math in `document`.
+
+    With `local` MathJax, which may have been installed without its image
+    fonts, image fonts are disabled.
+    """
+    extensions = tex_extensions(tex_usage(document))
+    config = 'TeX: {extensions: [%s]}' % ', '.join(
+        '"%s"' % name for name in extensions)
+    if local:
+        config += ', "HTML-CSS": {imageFont: null}'
+    return slim_config, config_script % config
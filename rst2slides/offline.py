@@ -0,0 +1,187 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Offline presentations with a generated service worker.
+
+With the ``--service-worker`` writer option, the presentation.html output is
+accompanied by::
+
+    presentation.sw.js           service worker
+    presentation.precache.json   {url: content hash} for every local file
+
+The precache manifest lists the presentation itself and every local file it
+references: the reveal.js scripts, plugins, and stylesheets, the highlight.js
+style, the fonts and images the stylesheets use, backgrounds, images,
+videos, slide fragments written by --chunk-slides, and, if MathJax is
+installed locally, the MathJax files needed to typeset with the configured
+output jax.  The service worker embeds the manifest, so that it changes
+whenever any precached file changes, and the browser then installs the
+new version, fetches the changed files, and discards the old cache.
+
+The presentation is served from the cache on repeat visits, except the
+html itself, which is fetched from the network when possible.  Other
+same-origin requests (lazily loaded MathJax extensions, for example) are
+cached the first time they succeed.  Files from other sites, such as the
+default MathJax from a CDN, are not cached; run
+``python -m rst2slides.download -m`` to install MathJax locally for offline
+presentations with math.  Service workers require the presentation to be
+served over http from localhost or over https.
+
+"""
+
+import json
+import os
+import os.path
+import re
+from hashlib import sha256
+
+from .assets import used_files, file_hash, is_under
+
+_mathjax = re.compile(r"mathjax: '([^']+/MathJax\.js)',\s*"
+                      r"config: '([^']+)'")
+
+# Directories under a local MathJax, relative to MathJax.js, which the
+# HTML-CSS output jax loads from for the TeX fonts.
+mathjax_dirs = ('jax/output/HTML-CSS/fonts/TeX',
+                'fonts/HTML-CSS/TeX/woff')
+
+
+def mathjax_files(html, html_dir):
+    """Return local MathJax files needed by `html`."""
+    found = set()
+    for script, config in _mathjax.findall(html):
+        script = os.path.join(html_dir, script)
+        if not os.path.isfile(script):
+            continue
+        root = os.path.dirname(script)
+        found.add(script)
+        for name in config.split(','):
+            path = os.path.join(root, 'config', name.strip() + '.js')
+            if os.path.isfile(path):
+                found.add(path)
+        for directory in mathjax_dirs:
+            for top, _, names in os.walk(os.path.join(root, directory)):
+                found.update(os.path.join(top, name) for name in names)
+    return found
+
+
+def precache_manifest(html, destination_path, fragments=()):
+    """Return {url: hash} for the presentation and files it uses.
+
+    The files used by the html `fragments` of a chunked presentation,
+    whose urls are relative to the presentation, are included.
+    """
+    html_dir = os.path.dirname(destination_path) or os.curdir
+    paths = used_files(html, html_dir) | mathjax_files(html, html_dir)
+    for fragment in fragments:
+        paths |= used_files(fragment, html_dir)
+    paths.add(destination_path)
+    manifest = {}
+    for path in paths:
+        if not is_under(path, html_dir):
+            continue  # not reachable relative to the service worker
+        url = os.path.relpath(path, html_dir).replace(os.sep, '/')
+        manifest[url] = file_hash(path)
+    return manifest
+
+
+def names(destination_path):
+    """Return (service worker, precache manifest) paths."""
+    root = os.path.splitext(destination_path)[0]
+    return root + '.sw.js', root + '.precache.json'
+
+
+def register_service_worker(html, destination_path):
+    """Add service worker registration to `html`."""
+    sw = os.path.basename(names(destination_path)[0])
+    scope = os.path.basename(destination_path)
+    return html.replace('</body>', register_script % {'sw': sw,
+                                                      'scope': scope}, 1)
+
+
+def write_service_worker(html, destination_path, fragments=()):
+    """Write service worker and precache manifest for `html`."""
+    manifest = precache_manifest(html, destination_path, fragments)
+    sw_path, manifest_path = names(destination_path)
+    text = json.dumps(manifest, indent=1, sort_keys=True)
+    version = file_hash(destination_path)
+    for url in sorted(manifest):
+        version += manifest[url]
+    version = sha256(version.encode('utf-8')).hexdigest()[:16]
+    base = os.path.splitext(os.path.basename(destination_path))[0]
+    with open(manifest_path, 'w') as f:
+        f.write(text + '\n')
+    with open(sw_path, 'w') as f:
+        f.write(service_worker_js % {
+            'cache': 'rst2slides-{}-'.format(base), 'version': version,
+            'manifest': text,
+            'page': json.dumps(os.path.basename(destination_path))})
+
+
+register_script = """\
+<script>
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.register('%(sw)s', { scope: './%(scope)s' });
+    }
+</script>
+</body>"""
+
+service_worker_js = """\
+/* Service worker generated by rst2slides, do not edit. */
+var prefix = '%(cache)s';
+var cacheName = prefix + '%(version)s';
+var page = %(page)s;
+var manifest = %(manifest)s;
+
+self.addEventListener('install', function(event) {
+    event.waitUntil(caches.open(cacheName).then(function(cache) {
+        return cache.addAll(Object.keys(manifest));
+    }).then(function() { return self.skipWaiting(); }));
+});
+
+self.addEventListener('activate', function(event) {
+    event.waitUntil(caches.keys().then(function(keys) {
+        return Promise.all(keys.filter(function(key) {
+            return key.indexOf(prefix) === 0 && key !== cacheName;
+        }).map(function(key) { return caches.delete(key); }));
+    }).then(function() { return self.clients.claim(); }));
+});
+
+self.addEventListener('fetch', function(event) {
+    var request = event.request;
+    if (request.method !== 'GET') return;
+    var url = new URL(request.url);
+    if (url.origin !== location.origin) return;
+    if (url.pathname.split('/').pop() === page) {
+        // Network first for the presentation itself.
+        event.respondWith(fetch(request).then(function(response) {
+            var copy = response.clone();
+            caches.open(cacheName).then(function(cache) {
+                cache.put(request, copy);
+            });
+            return response;
+        }).catch(function() {
+            return caches.match(request, { ignoreSearch: true });
+        }));
+        return;
+    }
+    event.respondWith(caches.match(request).then(function(cached) {
+        return cached || fetch(request).then(function(response) {
+            if (response.ok) {
+                var copy = response.clone();
+                caches.open(cacheName).then(function(cache) {
+                    cache.put(request, copy);
+                });
+            }
+            return response;
+        });
+    }));
+});
+"""
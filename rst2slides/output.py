@@ -0,0 +1,118 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Write output files atomically, and only when their content changes.
+
+The html of a presentation (and of each --variant) is written to a
+temporary file in the output directory, which is then renamed over the
+output file, so a web server or browser never sees a partly written
+presentation.  If the output file already exists with the same content
+(the same sha256 hash), it is left alone, so its modification time does
+not change, and rsync deploys, browser auto-reloaders, and build tools
+which watch the html do not see a spurious update.  A replaced file keeps
+the permissions of the file it replaces.
+
+"""
+
+import os
+import os.path
+import tempfile
+from hashlib import sha256
+
+from docutils import io
+
+_block = 1 << 16
+
+
+def file_digest(path):
+    """Return sha256 digest of the content of `path`, or None if missing."""
+    digest = sha256()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(_block), b''):
+                digest.update(block)
+    except (IOError, OSError):
+        return None
+    return digest.digest()
+
+
+def replace_file(path, data, if_changed=True):
+    """Atomically replace `path` by bytes `data`, return True if written.
+
+    If `if_changed`, leave `path` alone and return False when it already
+    holds `data`.
+    """
+    if if_changed and file_digest(path) == sha256(data).digest():
+        return False
+    dest = os.path.dirname(path)
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except OSError:
+        mode = os.umask(0)
+        os.umask(mode)
+        mode = 0o666 & ~mode
+    fd, tmp = tempfile.mkstemp(dir=dest or None, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return True
+
+
+class AtomicFileOutput(io.FileOutput):
+
+    """FileOutput which replaces its file atomically, if its content changed.
+
+    After `write`, `unchanged` is True if the file was left alone.
+    """
+
+    unchanged = False
+
+    def write(self, data):
+        if self.opened or isinstance(data, str) and self.encoding in (
+                None, 'unicode'):
+            return io.FileOutput.write(self, data)
+        if isinstance(data, str):
+            if os.linesep != '\n':
+                data = data.replace('\n', os.linesep)  # as in text mode
+            data = self.encode(data)
+        self.unchanged = not replace_file(self.destination_path, data)
+        return data
+
+
+def output_path(destination):
+    """Return the path of the file `destination` writes, or None.
+
+    Standard output (which docutils names '<stdout>'), files opened by the
+    caller, and in-memory destinations have no path beside which to write
+    fragments, indices, and so on.
+    """
+    path = getattr(destination, 'destination_path', None)
+    if not path or path == '<stdout>' or getattr(destination, 'opened',
+                                                 False):
+        return None
+    return path
+
+
+def atomic_output(destination):
+    """Return AtomicFileOutput for FileOutput `destination` to a named file.
+
+    Other destinations (standard output, file objects) are returned as is.
+    """
+    if (type(destination) is not io.FileOutput or destination.opened or
+            not destination.destination_path):
+        return destination
+    return AtomicFileOutput(destination_path=destination.destination_path,
+                            encoding=destination.encoding,
+                            error_handler=destination.error_handler)
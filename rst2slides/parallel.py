@@ -0,0 +1,99 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Translate the slides of a presentation in parallel.
+
+With the ``--translate-jobs=N`` writer option, the top-level slides of the
+doctree are translated to html in a pool of N processes before the usual
+walk over the document, which then inserts the html of each slide instead
+of visiting it.  The output is identical to the serial translation.
+
+Apart from the body of the slide itself, translating a top-level slide
+only affects the math header (the MathJax script tag, set by the first
+math node), meta tags, and recorded dependencies of the translator, which
+are returned to the parent along with the html.  Each slide starts with a
+section level of 0, and the pending close of an enclosing section is left
+to the parent.
+
+The pool passes the translator class and doctree to the initializer of
+each worker, which the workers inherit by forking rather than unpickling,
+so this requires the fork start method, which is not available on
+Windows.  Elsewhere, or with fewer than two jobs or slides, translation is
+serial.
+
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from .doctree import is_slide
+
+# (translator_class, document) of a worker process, set by init_worker
+_worker_job = None
+chunks_per_job = 4  # for load balancing among workers
+
+
+def init_worker(job):
+    """Keep the (translator_class, document) `job` of a worker process."""
+    global _worker_job
+    _worker_job = job
+
+
+def translate_range(start, stop):
+    """Translate top-level slides `start` to `stop` in a worker process."""
+    translator_class, document = _worker_job
+    slides = [child for child in document.children if is_slide(child)]
+    translator = translator_class(document)
+    deps = set(document.settings.record_dependencies.list)
+    results = []
+    for node in slides[start:stop]:
+        translator.body = []
+        nmeta = len(translator.meta)
+        translator.section_level = 0
+        translator.close_section = False
+        node.walkabout(translator)
+        results.append((translator.body, translator.close_section,
+                        translator.meta[nmeta:]))
+    new_deps = [path for path in document.settings.record_dependencies.list
+                if path not in deps]
+    return results, translator.math_header, translator.mathjax_url, new_deps
+
+
+def translate_slides(translator_class, document, jobs):
+    """Return {id(slide): (body, close_section, meta)}, math header, url.
+
+    Return None if translation should be serial.
+    """
+    slides = [child for child in document.children if is_slide(child)]
+    if jobs < 2 or len(slides) < 2:
+        return None
+    try:
+        context = multiprocessing.get_context('fork')
+    except ValueError:
+        return None
+    nchunks = min(len(slides), jobs * chunks_per_job)
+    bounds = [len(slides) * i // nchunks for i in range(nchunks + 1)]
+    job = translator_class, document
+    with ProcessPoolExecutor(jobs, mp_context=context,
+                             initializer=init_worker,
+                             initargs=(job,)) as pool:
+        futures = [pool.submit(translate_range, start, stop)
+                   for start, stop in zip(bounds[:-1], bounds[1:])]
+        results = [future.result() for future in futures]
+    translated, math_header, mathjax_url = {}, [], None
+    nodes = iter(slides)
+    for bodies, header, url, deps in results:
+        for result in bodies:
+            translated[id(next(nodes))] = result
+        if header and not math_header:
+            math_header, mathjax_url = header, url
+        for path in deps:
+            document.settings.record_dependencies.add(path)
+    return translated, math_header, mathjax_url
@@ -0,0 +1,310 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""A reStructuredText parser which parses slides in parallel.
+
+With the ``--parse-jobs=N`` option, the source is split at the titles of
+the top-level slides.  The header (the document title, subtitle, and title
+page) is parsed as usual, while the slides are parsed in a pool of N
+processes and appended to the header doctree before any transforms run.
+Each worker parses its slides after a skeleton of the header titles, so
+section levels are the same as in a single parse, and line numbers are
+preserved.
+
+The slides must be independent for this to work.  The whole document is
+parsed serially instead when the source contains substitutions, hyperlink
+targets or references, footnotes or citations, include directives, or
+directives with document-wide effects (contents, sectnum, header, footer,
+meta, title, role, default-role, or reveal, configure, and titlepage after
+the header).  It is also parsed serially when any slide produces a system
+message, or when slide titles produce duplicate ids, so that messages and
+ids are exactly those of a serial parse.
+
+The top-level slides are the sections at the shallowest title level used
+more than once, as long as every shallower title (the document title and
+subtitle) precedes the first of them.  The pool passes the parser,
+settings, and split source to the initializer of each worker, which the
+workers inherit by forking rather than unpickling, so parallel parsing
+requires the fork start method, which is not available on Windows.
+
+"""
+
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import docutils.statemachine
+from docutils import nodes, frontend
+from docutils.nodes import make_id
+from docutils.parsers import rst
+from docutils.parsers.rst import roles, states
+from docutils.utils import new_document
+
+from .doctree import detach, adopt
+
+adornment_re = re.compile(r'^([!-/:-@\[-`{-~])\1*\s*$')
+unsafe_re = re.compile(r'''
+    ^\s*\.\.\s+(\||_|\[)          # substitution, target, footnote, citation
+  | ^\s*\.\.\s+(include|contents|sectnum|section-numbering|header|footer
+                |meta|title|role|default-role|target-notes)::
+  | ^\s*__(\s|$)                  # anonymous target
+  | \|[^|\s]([^|]*[^|\s])?\|      # substitution reference
+  | [\w`\]]_{1,2}(?!\w)           # hyperlink, footnote, citation reference
+  | (^|\W)_`                      # inline target
+  | ^\s*:name:                    # explicit target option
+''', re.VERBOSE)
+header_only_re = re.compile(r'^\s*\.\.\s+(reveal|configure|titlepage)::')
+
+# (parser, settings, source_path, skeleton, lines, starts, counts) of a
+# worker process, set by init_worker
+_worker_job = None
+chunks_per_job = 4  # for load balancing among workers
+
+
+def find_titles(lines):
+    """Return list of (start, stop, style) of section titles in `lines`."""
+    titles = []
+    n = len(lines)
+    i = stop = 0
+    while i < n - 1:
+        line = lines[i]
+        # A title may follow a blank line or another title.
+        blank_before = i == stop or not lines[i-1].strip()
+        over = adornment_re.match(line)
+        if (over and blank_before and i < n - 2 and lines[i+1].strip() and
+                not adornment_re.match(lines[i+1]) and
+                lines[i+2].rstrip() == line.rstrip()):
+            titles.append((i, i + 3, (line[0], line[0])))
+            i = stop = i + 3
+            continue
+        if (blank_before and line.strip() and not line[0].isspace() and
+                not over and adornment_re.match(lines[i+1]) and
+                len(lines[i+1].rstrip()) >= len(line.rstrip())):
+            titles.append((i, i + 2, (lines[i+1][0],)))
+            i = stop = i + 2
+            continue
+        i += 1
+    return titles
+
+
+def split_slides(lines):
+    """Return (skeleton, starts, counts) splitting `lines`, or None.
+
+    The skeleton lists the header title lines, starts is the list of line
+    numbers of the slide titles, followed by len(lines), and counts is the
+    number of titles in each slide, including subslides.
+    """
+    titles = find_titles(lines)
+    styles, levels = [], []
+    for _, _, style in titles:
+        if style not in styles:
+            styles.append(style)
+        level = styles.index(style) + 1
+        if level > (levels[-1] if levels else 0) + 1:
+            return None  # inconsistent, let the parser report it
+        levels.append(level)
+    slide_level = min([level for level in set(levels)
+                       if levels.count(level) > 1] or [0])
+    if not slide_level:
+        return None
+    first = levels.index(slide_level)
+    if levels[:first] != list(range(1, slide_level)):
+        return None
+    skeleton = []
+    for start, stop, _ in titles[:first]:
+        skeleton.extend(lines[start:stop] + [''])
+    starts = [start for (start, _, _), level in zip(titles, levels)
+              if level == slide_level]
+    counts = [0] * len(starts)
+    for (start, _, _), level in zip(titles[first:], levels[first:]):
+        if level == slide_level:
+            slide = starts.index(start)
+        counts[slide] += 1
+    for i, line in enumerate(lines):
+        if unsafe_re.search(line):
+            return None
+        if i >= starts[0] and header_only_re.match(line):
+            return None
+    return skeleton, starts + [len(lines)], counts
+
+
+def header_section(document, depth):
+    """Return innermost of `depth` nested header sections, and their ids."""
+    parent, ids = document, []
+    for _ in range(depth):
+        sections = [child for child in parent.children
+                    if isinstance(child, nodes.section)]
+        if not sections:
+            return None, ids
+        parent = sections[-1]
+        ids.extend(parent['ids'])
+    return parent, ids
+
+
+def titled_sections(node):
+    return [section for section in node.findall(nodes.section)
+            if section.children and isinstance(section[0], nodes.title)]
+
+
+def parse_lines(parser, settings, source_path, lines, input_offset=0):
+    """Parse `lines` into a new document, return it and its messages."""
+    document = new_document(source_path, settings)
+    document.reporter.stream = None
+    messages = []
+    document.reporter.attach_observer(messages.append)
+    machine = states.RSTStateMachine(state_classes=parser.state_classes,
+                                     initial_state=parser.initial_state)
+    machine.run(lines, document, input_offset=input_offset,
+                inliner=parser.inliner)
+    return document, messages
+
+
+def expected_id(settings, name):
+    if settings.id_prefix:
+        return settings.id_prefix + make_id('x' + name)[1:]
+    return make_id(name)
+
+
+def init_worker(job):
+    """Keep the job tuple of a worker process, see parse_range."""
+    global _worker_job
+    _worker_job = job
+
+
+def parse_range(first, last):
+    """Parse slides `first` to `last` in a worker process.
+
+    Return list of (section, pending, dependencies), and ids of the header
+    sections, or None if the slides must be parsed serially.
+    """
+    (parser, settings, source_path, skeleton, lines, starts,
+     counts) = _worker_job
+    depth = skeleton.count('')  # number of header titles
+    results, header_ids = [], []
+    dependencies = settings.record_dependencies
+    for i in range(first, last):
+        ndeps = len(dependencies.list)
+        start, stop = starts[i], starts[i+1]
+        document, messages = parse_lines(parser, settings, source_path,
+                                         skeleton + lines[start:stop],
+                                         start - len(skeleton))
+        if messages:
+            return None
+        parent, header_ids = header_section(document, depth)
+        if parent is None:
+            return None
+        section = parent.children[-1] if parent.children else None
+        if (not isinstance(section, nodes.section) or
+                len(parent.children) != (2 if depth else 1)):
+            return None  # slide must be the one section after the title
+        if len(titled_sections(section)) != counts[i]:
+            return None  # titles missed when splitting
+        for node in section.findall(nodes.Element):
+            if isinstance(node, nodes.section):
+                if [expected_id(settings, name) for name in node['names']
+                        ] != node['ids']:
+                    return None
+            elif node['ids'] or node['names']:
+                return None
+        pending = [(node, int(priority.split('-')[0]))
+                   for priority, _, node, _ in document.transformer.transforms
+                   if node is not None]
+        if len(pending) != len(list(section.findall(nodes.pending))):
+            return None
+        detach(section)
+        results.append((section, pending, dependencies.list[ndeps:]))
+    return results, header_ids
+
+
+def parse_slides(parser, document, lines):
+    """Return (header lines, header depth, slide results), or None."""
+    jobs = getattr(document.settings, 'parse_jobs', 0)
+    if jobs < 2:
+        return None
+    try:
+        context = multiprocessing.get_context('fork')
+    except ValueError:
+        return None
+    if any(len(line) > document.settings.line_length_limit
+           for line in lines):
+        return None
+    split = split_slides(lines)
+    if split is None:
+        return None
+    skeleton, starts, counts = split
+    depth = skeleton.count('')
+    # Check the header parses to exactly the skeleton sections.
+    header, messages = parse_lines(parser, document.settings,
+                                   document['source'], lines[:starts[0]])
+    if len(titled_sections(header)) != depth:
+        return None
+    nslides = len(starts) - 1
+    nchunks = min(nslides, jobs * chunks_per_job)
+    bounds = [nslides * i // nchunks for i in range(nchunks + 1)]
+    job = (parser, document.settings, document['source'], skeleton, lines,
+           starts, counts)
+    try:
+        with ProcessPoolExecutor(jobs, mp_context=context,
+                                 initializer=init_worker,
+                                 initargs=(job,)) as pool:
+            futures = [pool.submit(parse_range, first, last)
+                       for first, last in zip(bounds[:-1], bounds[1:])]
+            chunks = [future.result() for future in futures]
+    except Exception:
+        return None  # including errors above halt_level
+    if None in chunks:
+        return None
+    results, ids = [], chunks[0][1]
+    for slides, _ in chunks:
+        results.extend(slides)
+        for section, _, _ in slides:
+            ids.extend(id for node in section.findall(nodes.section)
+                       for id in node['ids'])
+    if len(ids) != len(set(ids)):
+        return None  # duplicate titles
+    return lines[:starts[0]], depth, results
+
+
+class Parser(rst.Parser):
+    """The reStructuredText parser, optionally parsing slides in parallel."""
+
+    settings_spec = rst.Parser.settings_spec + (
+        'rst2slides Parser Options',
+        None,
+        (('Parse top-level slides in N parallel processes when they are '
+          'independent.  Default: 0 (serial).',
+          ['--parse-jobs'],
+          {'default': 0, 'metavar': '<N>',
+           'validator': frontend.validate_nonnegative_int}),))
+
+    def parse(self, inputstring, document):
+        tab_width = document.settings.setdefault('tab_width', 8)
+        lines = docutils.statemachine.string2lines(
+            inputstring, tab_width=tab_width, convert_whitespace=True)
+        parsed = parse_slides(self, document, lines)
+        if parsed is None:
+            return rst.Parser.parse(self, inputstring, document)
+        header, depth, slides = parsed
+        self.setup_parse(inputstring, document)
+        self.document.settings.setdefault('syntax_highlight', 'long')
+        self.statemachine = states.RSTStateMachine(
+            state_classes=self.state_classes,
+            initial_state=self.initial_state,
+            debug=document.reporter.debug_flag)
+        self.statemachine.run(header, document, inliner=self.inliner)
+        parent, _ = header_section(document, depth)
+        for section, pending, dependencies in slides:
+            adopt(document, parent, section, pending)
+            for path in dependencies:
+                document.settings.record_dependencies.add(path)
+        # restore the "default" default role after parsing a document
+        if '' in roles._roles:
+            del roles._roles['']
+        self.finish_parse()
@@ -0,0 +1,234 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Remove CSS rules which cannot match anything in a presentation.
+
+A presentation links reveal.css, a reveal.js theme, a highlight.js style,
+and usually css/custom.css, but uses only a small fraction of their rules.
+With the ``--purge-css`` writer option, each local stylesheet linked from
+the presentation is replaced by a purged copy containing only rules whose
+selectors could match the elements, classes, and ids in the generated html.
+Classes in data-state attributes (from the reveal-state directive) count as
+used, since reveal.js adds them to the document element, as do the classes
+reveal.js, highlight.js, and MathJax create at runtime (see `safe_classes`
+and `safe_prefixes` below).
+
+Each stylesheet is purged separately and its link replaced in place, which
+preserves the cascade order.  The purged copies are written to
+``<reveal_dir>/css/purged/`` with names including a hash of the stylesheet
+and the vocabulary of the presentation, so an unchanged presentation reuses
+the existing files without purging again, and the copies an earlier build
+of the presentation used are removed when no presentation uses them (see
+rst2slides.assets).  Relative url() references in the purged copies are
+rewritten to point to the original locations.
+
+"""
+
+import os
+import os.path
+import re
+from hashlib import sha1
+
+from .assets import is_remote, css_url, css_import
+
+# Elements reveal.js and its plugins create at runtime.
+safe_tags = {'html', 'body', 'div', 'span', 'a', 'button', 'aside', 'section',
+             'canvas', 'video', 'img', 'iframe', 'input', 'ul', 'li', 'p',
+             'pre', 'code', 'h1', 'h2', 'h3', 'strong', 'small', 'svg'}
+# Classes reveal.js adds at runtime.
+safe_classes = {
+    'reveal', 'slides', 'backgrounds', 'slide-background',
+    'slide-background-content', 'stack', 'present', 'past', 'future',
+    'controls', 'controls-arrow', 'progress', 'slide-number',
+    'slide-number-delimiter', 'slide-number-a', 'slide-number-b',
+    'navigate-left', 'navigate-right', 'navigate-up', 'navigate-down',
+    'enabled', 'fragmented', 'highlight', 'visible', 'current-fragment',
+    'fragment', 'overview', 'overview-deactivating', 'ready', 'center',
+    'has-light-background', 'has-dark-background', 'has-parallax-background',
+    'has-horizontal-slides', 'has-vertical-slides', 'no-transition',
+    'no-hover', 'rtl', 'print-pdf', 'pdf-page', 'paused', 'pause-overlay',
+    'overlay', 'overlay-preview', 'overlay-help', 'viewport-inner', 'header',
+    'spinner', 'close', 'external', 'icon', 'speaker-notes', 'show-notes',
+    'aria-status', 'playback', 'focused', 'zoomed', 'fullscreen',
+    'embedded', 'uncounted', 'notes', 'slide', 'none', 'fade', 'convex',
+    'concave', 'zoom', 'default', 'fast', 'slow', 'linear', 'reveal-print',
+    'state-background', 'roll', 'lazy-loaded', 'loaded'}
+safe_prefixes = ('hljs', 'MathJax', 'MJX', 'mjx', 'navigate-', 'controls-',
+                 'slide-', 'overlay-', 'fragment', 'highlight-')
+
+_comment = re.compile(r'/\*.*?\*/', re.S)
+_tag = re.compile(r'<([a-zA-Z][-\w]*)')
+_class = re.compile(r'\sclass="([^"]*)"')
+_id = re.compile(r'\sid="([^"]*)"')
+_state = re.compile(r'\sdata-state="([^"]*)"')
+_pseudo = re.compile(r'::?[-\w]+(\([^)]*\))?')
+_attribute = re.compile(r'\[[^\]]*\]')
+_token = re.compile(r'([.#]?)(-?[_a-zA-Z][-\w]*)')
+_link = re.compile(r'(<link rel="stylesheet" href=")([^"]+)(")')
+
+
+def vocabulary(html):
+    """Return (tags, classes, ids) sets used in `html`."""
+    tags = {t.lower() for t in _tag.findall(html)} | safe_tags
+    classes = set(safe_classes)
+    for value in _class.findall(html) + _state.findall(html):
+        classes.update(value.split())
+    ids = set()
+    for value in _id.findall(html):
+        ids.update(value.split())
+    return tags, classes, ids
+
+
+def selector_used(selector, vocab):
+    """Could `selector` match any element in the `vocab` presentation?"""
+    tags, classes, ids = vocab
+    simple = _pseudo.sub(' ', _attribute.sub(' ', selector))
+    for kind, name in _token.findall(simple):
+        if kind == '.':
+            if name not in classes and not name.startswith(safe_prefixes):
+                return False
+        elif kind == '#':
+            if name not in ids:
+                return False
+        elif name.lower() not in tags:
+            return False
+    return True
+
+
+def split_top(text, sep=','):
+    """Split `text` at `sep` characters outside parentheses."""
+    parts, depth, start = [], 0, 0
+    for i, c in enumerate(text):
+        if c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == sep and not depth:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def css_rules(css):
+    """Yield (prelude, body) for top-level rules, body None for @import."""
+    i, n = 0, len(css)
+    while i < n:
+        quote, j = None, i
+        while j < n:
+            c = css[j]
+            if quote:
+                if c == quote:
+                    quote = None
+            elif c in '\'"':
+                quote = c
+            elif c in '{;':
+                break
+            j += 1
+        prelude = css[i:j].strip()
+        if j >= n:
+            return
+        if css[j] == ';':
+            if prelude:
+                yield prelude + ';', None
+            i = j + 1
+            continue
+        depth, k = 1, j + 1
+        while k < n and depth:
+            c = css[k]
+            if quote:
+                if c == quote:
+                    quote = None
+            elif c in '\'"':
+                quote = c
+            elif c == '{':
+                depth += 1
+            elif c == '}':
+                depth -= 1
+            k += 1
+        yield prelude, css[j+1:k-1]
+        i = k
+
+
+def purge_css(css, vocab):
+    """Return `css` without rules which cannot match `vocab`."""
+    out = []
+    for prelude, body in css_rules(_comment.sub('', css)):
+        if body is None:
+            out.append(prelude)
+        elif prelude.startswith('@'):
+            name = prelude[1:].split(None, 1)[0].lower()
+            if name in ('media', 'supports', 'document', '-moz-document'):
+                inner = purge_css(body, vocab)
+                if inner.strip():
+                    out.append(prelude + ' {\n' + inner + '}')
+            else:  # @font-face, @keyframes, @page, and the like
+                out.append(prelude + ' {' + body + '}')
+        else:
+            selectors = [s for s in split_top(prelude)
+                         if selector_used(s, vocab)]
+            if selectors:
+                out.append(',\n'.join(selectors) + ' {' + body + '}')
+    return '\n'.join(out) + '\n'
+
+
+def rebase_urls(css, src_dir, dest_dir):
+    """Rewrite relative urls in `css` moved from `src_dir` to `dest_dir`."""
+    def rebase(url):
+        if is_remote(url):
+            return url
+        path = os.path.normpath(os.path.join(src_dir, url))
+        return os.path.relpath(path, dest_dir).replace(os.sep, '/')
+
+    css = css_url.sub(lambda m: 'url({0}{1}{0})'.format(m.group(1),
+                                                     rebase(m.group(2))), css)
+    return css_import.sub(lambda m: m.group(1) + m.group(2) +
+                       rebase(m.group(3)) + m.group(2), css)
+
+
+def purge_stylesheets(html, html_dir, reveal_dir, fragments=(),
+                      generated=None):
+    """Replace local stylesheet links in `html` by purged copies.
+
+    Relative hrefs in `html` and `reveal_dir` are relative to `html_dir`.
+    The rules kept are those which could match `html` or any of the html
+    `fragments` (the slides --chunk-slides loads separately).  Returns the
+    modified html, and adds the paths of the copies to the `generated` set.
+    """
+    html_dir = html_dir or os.curdir
+    vocab = vocabulary(''.join([html] + list(fragments)))
+    signature = repr([sorted(v) for v in vocab]).encode('utf-8')
+    if is_remote(reveal_dir):
+        reveal_dir = os.curdir  # reveal.js is remote, purge next to html
+    dest_dir = os.path.join(html_dir, reveal_dir, 'css', 'purged')
+
+    def purge(match):
+        href = match.group(2)
+        src = os.path.join(html_dir, href)
+        if is_remote(href) or not os.path.isfile(src):
+            return match.group(0)
+        with open(src, 'rb') as f:
+            css = f.read()
+        digest = sha1(css + signature).hexdigest()[:12]
+        name = os.path.splitext(os.path.basename(href))[0]
+        path = os.path.join(dest_dir, '{}-{}.css'.format(name, digest))
+        if not os.path.isfile(path):
+            if not os.path.isdir(dest_dir):
+                os.makedirs(dest_dir)
+            css = purge_css(css.decode('utf-8'), vocab)
+            css = rebase_urls(css, os.path.dirname(src), dest_dir)
+            with open(path, 'wb') as f:
+                f.write(css.encode('utf-8'))
+        if generated is not None:
+            generated.add(path)
+        url = os.path.relpath(path, html_dir).replace(os.sep, '/')
+        return match.group(1) + url + match.group(3)
+
+    return _link.sub(purge, html)
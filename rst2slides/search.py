@@ -0,0 +1,241 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Build-time full-text search index for presentations.
+
+The standard reveal.js search plugin searches the text of the page at
+runtime, which is slow for presentations with hundreds of slides.  With the
+``--search-index`` writer option, the text of every slide (title and body,
+and speaker notes with ``--search-notes``) is extracted from the doctree
+into an inverted index written next to the presentation::
+
+    presentation.html
+    presentation.search.json
+
+and the search-index.js plugin, installed in the reveal.js plugin
+directory, replaces the standard search plugin.  Press ctrl-shift-F to
+open the search box, as with the standard plugin.  The index has the
+form::
+
+    {"slides": [[h, v, id, title], ...],
+     "terms": {"term": [slide, ...], ...}}
+
+where h, v are reveal.js slide indices, and each term lists the indices
+of the slides containing it in the slides array.  Site builds merge the
+indices of all presentations into one (see rst2slides.site).
+
+"""
+
+import json
+import os.path
+import re
+
+from docutils import nodes
+
+from .doctree import iter_slides, slide_content, slide_title, slide_id
+from .download import install_file
+
+word_re = re.compile(r'\w+', re.UNICODE)
+unsearched = (nodes.raw, nodes.comment, nodes.system_message,
+              nodes.substitution_definition, nodes.pending)
+
+
+def node_text(node, notes=False):
+    """Return list of searchable text strings in `node`."""
+    if isinstance(node, nodes.Text):
+        return [node.astext()]
+    if isinstance(node, unsearched):
+        return []
+    if hasattr(node, 'aside_section') and not notes:
+        return []
+    text = []
+    for child in node.children:
+        text.extend(node_text(child, notes))
+    return text
+
+
+def terms(text):
+    """Return set of lower case index terms in `text`."""
+    return set(word.lower() for word in word_re.findall(text)
+               if len(word) > 1)
+
+
+def search_index(document, notes=False):
+    """Return search index dict for `document`."""
+    slides, index = [], {}
+    for h, v, node in iter_slides(document):
+        text = []
+        for child in slide_content(node):
+            text.extend(node_text(child, notes))
+        title = slide_title(node)
+        i = len(slides)
+        slides.append([h, v, slide_id(node), title])
+        for term in terms(title + ' ' + ' '.join(text)):
+            index.setdefault(term, []).append(i)
+    return {'slides': slides, 'terms': index}
+
+
+def index_name(destination_path):
+    """Return search index file name for html `destination_path`."""
+    if not destination_path:
+        return None
+    base = os.path.splitext(os.path.basename(destination_path))[0]
+    return base + '.search.json'
+
+
+def write_index(path, index):
+    with open(path, 'w') as f:
+        json.dump(index, f, sort_keys=True, separators=(',', ':'))
+
+
+def merge_indices(decks):
+    """Merge dict of {href: index} into a single site index.
+
+    Slides in the merged index are [deck, h, v, id, title], where deck is
+    an index into the list of hrefs in the "decks" key.
+    """
+    merged = {'decks': [], 'slides': [], 'terms': {}}
+    for deck, (href, index) in enumerate(sorted(decks.items())):
+        merged['decks'].append(href)
+        offset = len(merged['slides'])
+        merged['slides'].extend([deck] + slide for slide in index['slides'])
+        for term, postings in index['terms'].items():
+            merged['terms'].setdefault(term, []).extend(
+                offset + i for i in postings)
+    return merged
+
+
+def install_plugin(reveal_dir):
+    """Write search-index.js into the `reveal_dir` plugin directory."""
+    path = os.path.join(reveal_dir, 'plugin', 'search-index',
+                        'search-index.js')
+    if not os.path.isfile(path):
+        install_file(path, plugin_js)
+
+
+# Shared by the presentation plugin and the site index page.
+query_js = """\
+    function searchIndex(index, query) {
+        // Return slide indices matching every word of query, where the
+        // last word may be a prefix, ordered by number of title matches.
+        var words = query.toLowerCase().match(/[\\w]+/g) || [];
+        words = words.filter(function(w) { return w.length > 1; });
+        if (!words.length) return [];
+        var found = null;
+        words.forEach(function(word, k) {
+            var hits = {};
+            var prefix = k === words.length - 1;
+            for (var term in index.terms) {
+                if (term === word ||
+                        (prefix && term.lastIndexOf(word, 0) === 0)) {
+                    index.terms[term].forEach(function(i) { hits[i] = 1; });
+                }
+            }
+            if (found === null) {
+                found = hits;
+            } else {
+                for (var i in found) if (!hits[i]) delete found[i];
+            }
+        });
+        var titleAt = index.decks ? 4 : 3;
+        function score(i) {
+            var title = (index.slides[i][titleAt] || '').toLowerCase();
+            return words.filter(function(w) {
+                return title.indexOf(w) >= 0; }).length;
+        }
+        return Object.keys(found).map(Number).sort(function(a, b) {
+            return score(b) - score(a) || a - b; });
+    }
+"""
+
+plugin_js = """\
+/*
+ * rst2slides search plugin: search the index written by the rst2slides
+ * --search-index option.  Press ctrl-shift-F to open the search box.
+ */
+(function() {
+    var index = null, box, input, results;
+
+%(query)s
+    function load(callback) {
+        if (index) return callback();
+        var xhr = new XMLHttpRequest();
+        xhr.onload = function() {
+            index = JSON.parse(xhr.responseText);
+            callback();
+        };
+        xhr.open('GET', Reveal.getConfig().searchIndex);
+        xhr.send();
+    }
+
+    function go(slide) {
+        if (slide[2]) {
+            window.location.hash = '#/' + slide[2];
+        } else {
+            Reveal.slide(slide[0], slide[1]);
+        }
+    }
+
+    function show() {
+        load(function() {
+            results.innerHTML = '';
+            searchIndex(index, input.value).slice(0, 20).forEach(
+                function(i) {
+                    var slide = index.slides[i];
+                    var item = document.createElement('li');
+                    item.textContent = slide[3] || (slide[0] + '/' + slide[1]);
+                    item.style.cursor = 'pointer';
+                    item.onclick = function() { go(slide); };
+                    results.appendChild(item);
+                });
+        });
+    }
+
+    function create() {
+        box = document.createElement('div');
+        box.style.cssText = 'position: absolute; top: 10px; right: 10px; ' +
+            'z-index: 50; background: rgba(255,255,255,0.9); padding: 5px; ' +
+            'font-size: 14px; max-height: 50%%; overflow: auto; ' +
+            'display: none;';
+        input = document.createElement('input');
+        input.type = 'search';
+        input.placeholder = 'Search';
+        input.addEventListener('input', show, false);
+        input.addEventListener('keydown', function(event) {
+            if (event.keyCode === 13 && results.firstChild) {
+                results.firstChild.onclick();
+            } else if (event.keyCode === 27) {
+                toggle();
+            }
+            event.stopPropagation();
+        }, false);
+        results = document.createElement('ol');
+        results.style.cssText = 'margin: 5px 0 0 0; padding-left: 2em;';
+        box.appendChild(input);
+        box.appendChild(results);
+        document.querySelector('.reveal').appendChild(box);
+    }
+
+    function toggle() {
+        if (!box) create();
+        var open = box.style.display === 'none';
+        box.style.display = open ? 'block' : 'none';
+        if (open) input.focus();
+    }
+
+    document.addEventListener('keydown', function(event) {
+        if (event.keyCode === 70 && event.shiftKey &&
+                (event.ctrlKey || event.metaKey)) {
+            event.preventDefault();
+            toggle();
+        }
+    }, false);
+})();
+""" % {'query': query_js}
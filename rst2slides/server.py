@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""HTTP service rendering rst to reveal.js presentations.
+
+`RenderService` is a WSGI application.  It renders in a pool of worker
+processes, which import rst2slides and docutils and render a small document
+when they start, so that requests do not pay for imports.  Rendered html is
+kept in a least recently used cache keyed by a hash of the source and
+options, limited by the total size of the cached html.
+
+Requests::
+
+    POST /render     body is the rst source (any text content type), or
+                     JSON {"source": rst, "options": {setting: value}};
+                     query parameters are also taken as options
+    GET  /metrics    JSON request counts, cache hit rate, and latencies
+    GET  /healthz    "ok"
+
+Options are docutils settings, restricted to `safe_options`, and are
+converted by the validators of the writer options as in a docutils
+configuration file; an unknown value is a 400 error.  Since the sources
+come from users, file insertion (include directive, raw directive file
+option, configure directive stylesheet and template options), the raw
+directive, and the reveal directive options choosing scripts (revealPath,
+mathjax, mathjaxConfig, autoSlideMethod) are disabled.  Other reveal
+directive options are escaped where the writer puts them in the page.  A
+render which takes longer than the timeout gets a 504 response, and the
+worker pool is replaced, so that the stuck worker is killed rather than
+holding its place in the pool.
+
+This module can be run as a script to start a standalone server::
+
+    python -m rst2slides.server [--host HOST] [--port PORT] [--workers N]
+                                [--cache-mb MB] [--timeout SECONDS]
+
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from hashlib import sha256
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import make_server, WSGIServer
+
+if sys.version_info < (3,):
+    from urlparse import parse_qsl
+else:
+    from urllib.parse import parse_qsl
+
+# docutils settings a request may override
+safe_options = {'initial_header_level', 'table_style', 'footnote_references',
+                'smart_quotes', 'compact_lists', 'compact_field_lists',
+                'attribution', 'language_code', 'cloak_email_addresses',
+                'stylesheet'}
+service_settings = {'file_insertion_enabled': False, 'raw_enabled': False,
+                    'embed_stylesheet': False, 'report_level': 5,
+                    'halt_level': 4, 'warning_stream': False,
+                    'stylesheet_path': []}
+
+warmup_source = """\
+=====
+Title
+=====
+
+Slide
+=====
+
+Text with *emphasis* and math :math:`x^2`.
+"""
+
+
+def warm_worker():
+    """Import rst2slides and docutils in a new worker process."""
+    from . import render
+    render(warmup_source, **service_settings)
+
+
+def settings_validator():
+    """Return function converting request options to docutils settings.
+
+    The function converts each option with the validator of its entry in
+    the settings_spec of the rst2slides parser and writer, or checks it
+    against the entry's choices, and raises ValueError for a bad value.
+    """
+    import warnings
+    from docutils.frontend import OptionParser
+    from .slides import Parser, Writer
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        parser = OptionParser(components=(Parser, Writer))
+    specs = {}
+    for group in [parser] + parser.option_groups:
+        for option in group.option_list:
+            if option.dest in safe_options:
+                specs.setdefault(option.dest, option)  # not --no-<option>
+
+    def validate(options):
+        settings = {}
+        for name, value in options.items():
+            option = specs[name]
+            if isinstance(value, bool):  # from JSON
+                value = 'yes' if value else 'no'
+            elif isinstance(value, list):
+                value = ','.join(str(item) for item in value)
+            else:
+                value = str(value)
+            try:
+                if option.validator:
+                    value = option.validator(name, value, parser)
+            except (ValueError, LookupError) as e:
+                raise ValueError('bad value for {}: {}'.format(name, e))
+            if option.choices and value not in option.choices:
+                raise ValueError('bad value for {}: {!r} is not one of {}'
+                                 ''.format(name, value,
+                                           ', '.join(option.choices)))
+            settings[name] = value
+        return settings
+
+    return validate
+
+
+def render_html(source, options):
+    from . import render
+    settings = dict(options)
+    settings.update(service_settings)
+    return render(source, **settings)
+
+
+class LRUCache(object):
+    """Thread-safe least recently used cache limited by total size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.pop(key, None)
+            if value is not None:
+                self.entries[key] = value  # most recently used is last
+            return value
+
+    def put(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+            self.entries[key] = value
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, old = self.entries.popitem(last=False)
+                self.nbytes -= len(old)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class Metrics(object):
+    """Request counters and recent latencies."""
+    keep = 1000  # number of latencies kept for percentiles
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = dict(requests=0, hits=0, misses=0, errors=0,
+                           timeouts=0)
+        self.latencies = []
+
+    def record(self, outcome, seconds):
+        with self.lock:
+            self.counts['requests'] += 1
+            self.counts[outcome] += 1
+            self.latencies.append(seconds)
+            del self.latencies[:-self.keep]
+
+    def report(self):
+        with self.lock:
+            counts = dict(self.counts)
+            latencies = sorted(self.latencies)
+        lookups = counts['hits'] + counts['misses']
+        counts['hit_rate'] = counts['hits'] / float(lookups) if lookups else 0.
+        if latencies:
+            n = len(latencies)
+            counts['latency_ms'] = {
+                'mean': 1000. * sum(latencies) / n,
+                'p50': 1000. * latencies[n // 2],
+                'p95': 1000. * latencies[min(n - 1, int(0.95 * n))],
+                'max': 1000. * latencies[-1]}
+        return counts
+
+
+class RenderService(object):
+    """WSGI application rendering rst to reveal.js html."""
+
+    def __init__(self, workers=None, cache_bytes=64 << 20, timeout=30.):
+        self.workers = workers or os.cpu_count() or 1
+        self.lock = threading.Lock()
+        self.pool = self.start_pool()
+        self.cache = LRUCache(cache_bytes)
+        self.metrics = Metrics()
+        self.timeout = timeout
+        self.validate = settings_validator()
+
+    def start_pool(self):
+        pool = ProcessPoolExecutor(self.workers, initializer=warm_worker)
+        # Start every worker now rather than on the first requests.
+        for _ in range(self.workers):
+            pool.submit(int)
+        return pool
+
+    def recycle(self, pool):
+        """Replace `pool`, in which a render timed out, by a new pool.
+
+        Renders already submitted to the old pool may still finish, but
+        the callers of all of them have given up after another timeout,
+        and then the old workers, including the stuck one, are killed.
+        """
+        with self.lock:
+            if self.pool is not pool:
+                return  # another timed out render replaced it
+            self.pool = self.start_pool()
+        # Not public, but ProcessPoolExecutor has no way to kill workers.
+        processes = list(pool._processes.values())
+        pool.shutdown(wait=False)
+
+        def kill():
+            time.sleep(self.timeout)
+            for process in processes:
+                process.terminate()
+
+        thread = threading.Thread(target=kill)
+        thread.daemon = True
+        thread.start()
+
+    def close(self):
+        self.pool.shutdown()
+
+    def render(self, source, options):
+        """Return (outcome, html) for rst `source` and settings `options`."""
+        key = sha256(json.dumps([source, options], sort_keys=True)
+                     .encode('utf-8')).hexdigest()
+        html = self.cache.get(key)
+        if html is not None:
+            return 'hits', html
+        pool = self.pool
+        future = pool.submit(render_html, source, options)
+        try:
+            html = future.result(self.timeout).encode('utf-8')
+        except TimeoutError:
+            self.recycle(pool)
+            raise
+        self.cache.put(key, html)
+        return 'misses', html
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        method = environ.get('REQUEST_METHOD', 'GET')
+        if path == '/render' and method == 'POST':
+            return self.handle_render(environ, start_response)
+        if path == '/metrics' and method == 'GET':
+            report = dict(self.metrics.report(), cache_entries=len(self.cache),
+                          cache_bytes=self.cache.nbytes)
+            return respond(start_response, '200 OK', json.dumps(report),
+                           'application/json')
+        if path == '/healthz':
+            return respond(start_response, '200 OK', 'ok')
+        return respond(start_response, '404 Not Found', 'not found')
+
+    def handle_render(self, environ, start_response):
+        start = time.time()
+        try:
+            source, options = parse_request(environ)
+            options = self.validate(options)
+        except ValueError as e:
+            return respond(start_response, '400 Bad Request', str(e))
+        try:
+            outcome, html = self.render(source, options)
+        except TimeoutError:
+            self.metrics.record('timeouts', time.time() - start)
+            return respond(start_response, '504 Gateway Timeout',
+                           'rendering took longer than {} seconds'
+                           ''.format(self.timeout))
+        except Exception as e:  # docutils reports errors as exceptions
+            self.metrics.record('errors', time.time() - start)
+            return respond(start_response, '422 Unprocessable Entity',
+                           '{}: {}'.format(type(e).__name__, e))
+        self.metrics.record(outcome, time.time() - start)
+        start_response('200 OK', [('Content-Type', 'text/html; charset=utf-8'),
+                                  ('Content-Length', str(len(html))),
+                                  ('X-Cache', 'hit' if outcome == 'hits'
+                                   else 'miss')])
+        return [html]
+
+
+def parse_request(environ):
+    """Return (source, options) from a /render request."""
+    try:
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        length = 0
+    body = environ['wsgi.input'].read(length).decode('utf-8')
+    options = dict(parse_qsl(environ.get('QUERY_STRING', '')))
+    if environ.get('CONTENT_TYPE', '').startswith('application/json'):
+        request = json.loads(body)
+        source = request.get('source', '')
+        options.update(request.get('options', {}))
+    else:
+        source = body
+    if not source.strip():
+        raise ValueError('empty rst source')
+    unknown = set(options) - safe_options
+    if unknown:
+        raise ValueError('unsupported options: ' + ', '.join(sorted(unknown)))
+    return source, options
+
+
+def respond(start_response, status, text, content_type='text/plain'):
+    data = text.encode('utf-8')
+    start_response(status, [('Content-Type', content_type + '; charset=utf-8'),
+                            ('Content-Length', str(len(data)))])
+    return [data]
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def serve(host='127.0.0.1', port=8000, workers=None, cache_mb=64,
+          timeout=30.):
+    service = RenderService(workers, int(cache_mb * (1 << 20)), timeout)
+    server = make_server(host, port, service, ThreadingWSGIServer)
+    print('Serving rst2slides on http://{}:{}/render'.format(host, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog='python -m rst2slides.server',
+        description='Serve rst to reveal.js rendering over http.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: number of cpus)')
+    parser.add_argument('--cache-mb', type=float, default=64,
+                        help='size of rendered html cache (default: 64)')
+    parser.add_argument('--timeout', type=float, default=30,
+                        help='seconds before a render is abandoned')
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.cache_mb, args.timeout)
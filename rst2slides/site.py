@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Build a directory tree of presentations as a static site.
+
+This module can be run as a script::
+
+    python -m rst2slides.site [root] [-j jobs] [--force] [--search]
+                              [--exclude pattern ...]
+
+Every .rst file under root (default the current directory) is converted to
+an .html file next to it, except files which another .rst file pulls in
+with an include directive (fragments, not presentations), and files whose
+path relative to root matches an --exclude shell pattern (which may be
+given more than once), such as 'drafts/*' or '*_notes.rst'.  All the
+presentations share a single reveal.js directory, root/ui, which is
+downloaded if necessary; each presentation gets the relative path from its
+own directory to root/ui as its reveal.js path, unless its reveal
+directive has a revealPath option.  Presentations
+are built in parallel, each in its own directory, so that relative paths
+such as css/custom.css work exactly as in a single build.
+
+The site records a hash of the inputs of each presentation (its source and
+the included files, images, videos, backgrounds, and stylesheets recorded
+when it was last built) in root/.rst2slides-site.json, and presentations
+whose inputs are unchanged (and whose html still exists) are not rebuilt.
+A presentation which is rebuilt but produces the same html as before is
+reported as unchanged, and its html file is not touched (see
+rst2slides.output).
+Finally, root/index.html lists all the presentations, with the document
+title and the titlepage directive information of each.
+
+With --search, every presentation is built with the --search-index writer
+option, the indices are merged into root/search.json, and root/index.html
+gets a search box which finds slides across all the presentations.
+
+"""
+
+import json
+import os
+import os.path
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+from xml.sax.saxutils import escape
+
+STATE = '.rst2slides-site.json'
+
+_include = re.compile(r'^\s*\.\.\s+include::\s*(\S.*?)\s*$', re.M)
+
+
+def included_files(path):
+    """Return set of absolute paths `path` pulls in with include directives.
+
+    Standard includes such as <isonum.txt> are not files under the site.
+    """
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            text = f.read()
+    except IOError:
+        return set()
+    top = os.path.dirname(path)
+    return {os.path.normpath(os.path.join(top, name))
+            for name in _include.findall(text)
+            if not (name.startswith('<') and name.endswith('>'))}
+
+
+def find_decks(root, reveal_dir, exclude=()):
+    """Return sorted list of .rst paths under `root`, relative to `root`.
+
+    Files included by other .rst files under `root`, and files whose
+    relative path matches one of the shell patterns `exclude`, are not
+    presentations.
+    """
+    from fnmatch import fnmatch
+    sources, included = [], set()
+    for top, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and
+                         os.path.join(top, d) != reveal_dir)
+        for f in sorted(files):
+            if f.endswith('.rst'):
+                path = os.path.join(top, f)
+                sources.append(path)
+                included |= included_files(path)
+    decks = []
+    for path in sources:
+        deck = os.path.relpath(path, root)
+        if os.path.normpath(path) in included or any(
+                fnmatch(deck.replace(os.sep, '/'), pattern)
+                for pattern in exclude):
+            continue
+        decks.append(deck)
+    return decks
+
+
+def input_hash(path, overrides, inputs=()):
+    """Hash source `path`, `overrides`, and `inputs` relative to `path`."""
+    digest = sha256(json.dumps(overrides, sort_keys=True).encode('utf-8'))
+    with open(path, 'rb') as f:
+        digest.update(f.read())
+    top = os.path.dirname(path)
+    for name in inputs:
+        digest.update(name.encode('utf-8') + b'\0')
+        try:
+            with open(os.path.join(top, name), 'rb') as f:
+                digest.update(sha256(f.read()).digest())
+        except IOError:
+            digest.update(b'missing')
+    return digest.hexdigest()
+
+
+def build_deck(source, destination, overrides):
+    """Build one presentation in its own directory, return index entry."""
+    from docutils import nodes
+    from docutils.core import publish_file
+    from .slides import Writer, Parser, settings_overrides
+    from .deps import dependencies
+    os.chdir(os.path.dirname(source))
+    settings = dict(settings_overrides)
+    settings.update(overrides)
+    writer = Writer()
+    publish_file(source_path=source, destination_path=destination,
+                 parser=Parser(), writer=writer, settings_overrides=settings)
+    document = writer.document
+    subtitle = [node.astext() for node in document.children
+                if isinstance(node, nodes.subtitle)]
+    inputs = [path for path in dependencies(document, destination)
+              if os.path.abspath(path) != source]
+    return {'title': document.get('title', ''),
+            'subtitle': ''.join(subtitle),
+            'titledata': dict(getattr(document, 'titledata', {})),
+            'inputs': inputs,
+            'hash': input_hash(source, overrides, inputs),
+            'unchanged': writer.unchanged}
+
+
+def build_site(root='.', jobs=None, force=False, search=False, exclude=()):
+    """Build all presentations under `root` and write root/index.html.
+
+    Sources matching the shell patterns `exclude` are skipped.
+    """
+    from .download import setup
+    root = os.path.abspath(root)
+    ui = os.path.join(root, 'ui')
+    setup(ui, None)
+    state_path = os.path.join(root, STATE)
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except (IOError, ValueError):
+        state = {}
+    decks, todo = {}, {}
+    for deck in find_decks(root, ui, exclude):
+        source = os.path.join(root, deck)
+        destination = os.path.splitext(source)[0] + '.html'
+        reveal_dir = os.path.relpath(ui, os.path.dirname(source))
+        overrides = {'reveal_dir': reveal_dir.replace(os.sep, '/')}
+        if search:
+            overrides['search_index'] = True
+        old = state.get(deck, {})
+        digest = input_hash(source, overrides, old.get('inputs', ()))
+        decks[deck] = dict(old, hash=digest)
+        if (force or old.get('hash') != digest or
+                not os.path.exists(destination)):
+            todo[deck] = (source, destination, overrides)
+    failed, unchanged = [], []
+    if todo:
+        with ProcessPoolExecutor(jobs) as pool:
+            futures = {deck: pool.submit(build_deck, *todo[deck])
+                       for deck in todo}
+            for deck, future in sorted(futures.items()):
+                try:
+                    info = future.result()
+                except BaseException as e:  # SystemExit from docutils
+                    print('FAILED {}: {}'.format(deck, e))
+                    failed.append(deck)
+                    del decks[deck]['hash']  # retry next time
+                    continue
+                if info.pop('unchanged'):
+                    print('unchanged {}'.format(deck))
+                    unchanged.append(deck)
+                else:
+                    print('built {}'.format(deck))
+                decks[deck].update(info)
+    print('{} built, {} unchanged, {} up to date, {} failed'.format(
+        len(todo) - len(failed) - len(unchanged), len(unchanged),
+        len(decks) - len(todo), len(failed)))
+    with open(state_path, 'w') as f:
+        json.dump(decks, f, indent=1, sort_keys=True)
+    if search:
+        write_search_index(root, decks)
+    write_index(root, decks, search)
+    return not failed
+
+
+def deck_href(deck):
+    return os.path.splitext(deck)[0].replace(os.sep, '/') + '.html'
+
+
+def write_search_index(root, decks):
+    """Merge search indices of `decks` into root/search.json."""
+    from .search import merge_indices, write_index as write_search
+    indices = {}
+    for deck in decks:
+        path = os.path.join(root, os.path.splitext(deck)[0] + '.search.json')
+        try:
+            with open(path) as f:
+                indices[deck_href(deck)] = json.load(f)
+        except (IOError, ValueError):
+            print('WARNING: no search index for {}'.format(deck))
+    write_search(os.path.join(root, 'search.json'), merge_indices(indices))
+
+
+def write_index(root, decks, search=False):
+    """Write root/index.html listing `decks`."""
+    from .search import query_js
+    items = []
+    for deck, info in sorted(decks.items()):
+        href = deck_href(deck)
+        title = info.get('title') or os.path.splitext(deck)[0]
+        href = escape(href, {'"': '&quot;'})
+        lines = ['<li><a href="{}">{}</a>'.format(href, escape(title))]
+        if info.get('subtitle'):
+            lines.append('<br>{}'.format(escape(info['subtitle'])))
+        titledata = info.get('titledata', {})
+        details = [titledata[k] for k in ('authors', 'organization', 'event',
+                                          'date') if titledata.get(k)]
+        if details:
+            lines.append('<br><small>{}</small>'.format(
+                escape(', '.join(details))))
+        items.append(''.join(lines) + '</li>')
+    with open(os.path.join(root, 'index.html'), 'w') as f:
+        f.write(index_template % {
+            'items': '\n'.join(items),
+            'search': search_template % query_js if search else ''})
+
+
+index_template = """\
+<!doctype html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Presentations</title>
+<style>
+  body {font-family: sans-serif; max-width: 50em; margin: 2em auto;}
+  li {margin-bottom: 1em;}
+</style>
+</head>
+<body>
+<h1>Presentations</h1>
+%(search)s<ul>
+%(items)s
+</ul>
+</body>
+</html>
+"""
+
+search_template = """\
+<p><input type="search" id="search" placeholder="Search all slides"></p>
+<ol id="results"></ol>
+<script>
+(function() {
+%s
+    var index = null;
+    var input = document.getElementById('search');
+    var results = document.getElementById('results');
+    function show() {
+        results.innerHTML = '';
+        searchIndex(index, input.value).slice(0, 50).forEach(function(i) {
+            var slide = index.slides[i];
+            var href = index.decks[slide[0]] + '#/' +
+                (slide[3] || slide[1] + '/' + slide[2]);
+            var link = document.createElement('a');
+            link.href = href;
+            link.textContent = (slide[4] || href) + ' (' +
+                index.decks[slide[0]] + ')';
+            var item = document.createElement('li');
+            item.appendChild(link);
+            results.appendChild(item);
+        });
+    }
+    input.addEventListener('input', function() {
+        if (index) return show();
+        var xhr = new XMLHttpRequest();
+        xhr.onload = function() {
+            index = JSON.parse(xhr.responseText);
+            show();
+        };
+        xhr.open('GET', 'search.json');
+        xhr.send();
+    }, false);
+})();
+</script>
+"""
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if '-h' in args or '--help' in args:
+        print('Usage: python -m rst2slides.site [root] [-j jobs] [--force] '
+              '[--search] [--exclude pattern ...]')
+        sys.exit(0)
+    jobs, force, search = None, '--force' in args, '--search' in args
+    exclude = []
+    while '--exclude' in args:
+        i = args.index('--exclude')
+        exclude.append(args[i+1])
+        del args[i:i+2]
+    if force:
+        args.remove('--force')
+    if search:
+        args.remove('--search')
+    if '-j' in args:
+        i = args.index('-j')
+        jobs = int(args[i+1])
+        del args[i:i+2]
+    sys.exit(0 if build_site(args[0] if args else '.', jobs, force, search,
+                             exclude) else 1)
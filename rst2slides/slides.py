@@ -137,25 +137,54 @@ Layout of your presentation repo::
 
 """
 
+import json
 import sys
 import os.path
+import re
+import warnings
 from glob import glob
 
-from docutils import nodes
+from docutils import nodes, frontend
 from docutils.writers import html5_polyglot
-from docutils.core import publish_cmdline, default_description
+from docutils.core import (publish_cmdline, publish_parts,
+                           default_description, default_usage)
+from docutils.readers.standalone import Reader
 from docutils.parsers.rst import directives
 
-from . import directives as local_directives
 from .directives import (VideoDirective, ConfigureDirective, RevealDirective,
                          BackgroundDirective, TransitionDirective,
                          TitlepageDirective, RevealStateDirective,
-                         AsideDirective, mathjax_default, HLjsCodeBlock)
-from .download import setup
+                         AsideDirective, mathjax_default, HLjsCodeBlock,
+                         REVEAL_DIR, apply_reveal_options,
+                         parse_reveal_options)
+from .download import setup, install_lock
+from .chunks import (chunk_dir, chunk_name, write_chunks, install_loader,
+                     remove_stale_chunks)
+from .purge import purge_stylesheets
+from .assets import (is_remote, hash_assets, write_manifest,
+                     replace_generation, generations_file)
+from .compress import precompress_presentation
+from .offline import (register_service_worker, write_service_worker,
+                      names as service_worker_names)
+from .deps import dependencies, write_depfile, write_dependency_manifest
+from .search import search_index, index_name, write_index, install_plugin
+from .parallel import translate_slides
+from .parser import Parser
+from .timing import timed
+from .doctree import iter_slides
+from .head import optimize_head
+from .mathconfig import mathjax_config
+from .hljs import bundle_name, code_languages, highlight_subset
+from .output import AtomicFileOutput, atomic_output, output_path
+from .split import SlideSplitter
+from .dataslides import DataSlidesDirective
 
 if sys.version_info >= (3,):
     basestring = str
 
+# The docutils directive registry is process wide.  Registering here, once,
+# under the import lock, leaves nothing to race over when documents are
+# parsed concurrently.
 directives.register_directive('video', VideoDirective)
 directives.register_directive('configure', ConfigureDirective)
 directives.register_directive('reveal', RevealDirective)
@@ -165,6 +194,7 @@ directives.register_directive('titlepage', TitlepageDirective)
 directives.register_directive('reveal-state', RevealStateDirective)
 directives.register_directive('aside', AsideDirective)
 directives.register_directive('code', HLjsCodeBlock)
+directives.register_directive('data-slides', DataSlidesDirective)
 
 # Unfortunately, Writer and HTMLTranslator are old-style classes in python2,
 # which means that super() does not work.
@@ -172,19 +202,282 @@ writer_baseclass = html5_polyglot.Writer
 html_baseclass = html5_polyglot.HTMLTranslator
 
 
+def parse_variant(spec):
+    """Return (name, reveal options) for --variant `spec`."""
+    name, _, options = spec.partition(':')
+    name = name.strip()
+    if not re.match(r'^[\w.-]+$', name):
+        raise ValueError('bad variant name "%s"' % name)
+    return name, parse_reveal_options(options)
+
+
+def validate_variants(setting, value=None, *args):
+    """Check --variant arguments, see docutils.frontend validators."""
+    if value is None:
+        value = setting
+    if not isinstance(value, list):
+        value = [value]
+    for spec in value:
+        parse_variant(spec)
+    return value
+
+
 class Writer(writer_baseclass):
     default_stylesheet = None
 
+    settings_spec = writer_baseclass.settings_spec + (
+        'rst2slides Writer Options',
+        None,
+        (('Write only the title page and the first N top-level slides to '
+          'the presentation, putting each remaining slide in a separate '
+          'fragment file loaded on demand.  Default: 0 (single file).',
+          ['--chunk-slides'],
+          {'default': 0, 'metavar': '<N>',
+           'validator': frontend.validate_nonnegative_int}),
+         ('Replace local stylesheets by copies purged of rules which match '
+          'nothing in the presentation.',
+          ['--purge-css'],
+          {'action': 'store_true', 'validator': frontend.validate_boolean}),
+         ('Copy the files the presentation uses from the reveal.js directory '
+          'to names containing a hash of their contents, and write a '
+          'manifest of the copies next to the output.',
+          ['--hash-assets'],
+          {'action': 'store_true', 'validator': frontend.validate_boolean}),
+         ('Write gzip (and brotli, if available) compressed copies of the '
+          'output and the files it uses from the reveal.js directory.',
+          ['--precompress'],
+          {'action': 'store_true', 'validator': frontend.validate_boolean}),
+         ('Generate a service worker which precaches the presentation and '
+          'every local file it uses, for offline presentations.',
+          ['--service-worker'],
+          {'action': 'store_true', 'validator': frontend.validate_boolean}),
+         ('Write a Make (or Ninja) depfile listing the input files of the '
+          'presentation: the source, included files, images, videos, '
+          'backgrounds, and stylesheets.',
+          ['--depfile'],
+          {'metavar': '<file>'}),
+         ('Write a JSON manifest of the input files of the presentation '
+          'with the hash of the contents of each.',
+          ['--dependency-manifest'],
+          {'metavar': '<file>'}),
+         ('Write a full-text search index of the slides next to the output, '
+          'and search it with the search-index plugin instead of the '
+          'standard reveal.js search plugin.',
+          ['--search-index'],
+          {'action': 'store_true', 'validator': frontend.validate_boolean}),
+         ('Include speaker notes in the search index.',
+          ['--search-notes'],
+          {'action': 'store_true', 'validator': frontend.validate_boolean}),
+         ('Translate top-level slides in N parallel processes.  The output '
+          'is identical to serial translation.  Default: 0 (serial).',
+          ['--translate-jobs'],
+          {'default': 0, 'metavar': '<N>',
+           'validator': frontend.validate_nonnegative_int}),
+         ('Report call counts and cumulative time of the visit and depart '
+          'methods of the N most expensive node types on standard error.  '
+          'Implies serial translation.  Default: 0 (no timing).',
+          ['--translator-timing'],
+          {'default': 0, 'metavar': '<N>',
+           'validator': frontend.validate_nonnegative_int}),
+         ('Also write presentation-NAME.html with the given reveal directive '
+          'options, for example --variant=handout:showNotes=true or '
+          '--variant=dark:theme=black,highlightStyle=zenburn.  The source is '
+          'parsed only once for all variants.  May be repeated.',
+          ['--variant'],
+          {'action': 'append', 'metavar': '<name:option=value,...>',
+           'validator': validate_variants}),
+         ('Start the head with preload hints for the reveal.js script, '
+          'the theme fonts, and the first slide background, and load the '
+          'print stylesheet with a media attribute instead of a script.',
+          ['--optimized-head'],
+          {'action': 'store_true', 'validator': frontend.validate_boolean}),
+         ('Inline the CSS rules the first slide needs, and load the full '
+          'stylesheets without blocking rendering.  Implies '
+          '--optimized-head.',
+          ['--critical-css'],
+          {'action': 'store_true', 'validator': frontend.validate_boolean}),
+         ('Load a copy of the highlight.js plugin with only the languages '
+          'of the code directives in the presentation.',
+          ['--hljs-subset'],
+          {'action': 'store_true', 'validator': frontend.validate_boolean}),
+         ('Split slides whose estimated height exceeds the reveal.js height '
+          'into vertical slides, dividing long lists and tables (repeating '
+          'their header rows).',
+          ['--split-slides'],
+          {'action': 'store_true', 'validator': frontend.validate_boolean}),
+         ('Path or URL of reveal.js, relative to the output, unless the '
+          'reveal directive has a revealPath option.  Default: "%s".'
+          % REVEAL_DIR,
+          ['--reveal-dir'],
+          {'default': REVEAL_DIR, 'metavar': '<path>'}),
+         ('Do not download reveal.js or MathJax, or install plugins, even '
+          'if they are missing.',
+          ['--no-download'],
+          {'dest': 'download', 'default': True, 'action': 'store_false',
+           'validator': frontend.validate_boolean}),))
+
     def __init__(self):
         # Base class is old style in python2, super does not work.
         writer_baseclass.__init__(self)
         self.translator_class = HTMLTranslator
 
+    def get_transforms(self):
+        return writer_baseclass.get_transforms(self) + [SlideSplitter]
+
+    def translate(self):
+        # The fragment file names must be known during translation.
+        destination_path = output_path(self.destination)
+        self.document.chunk_dir = chunk_dir(destination_path)
+        self.document.html_dir = os.path.dirname(destination_path or '')
+        if self.document.settings.search_index:
+            self.document.search_index = index_name(destination_path)
+            if not destination_path:
+                self.document.reporter.warning(
+                    '--search-index requires an output file')
+        settings = self.document.settings
+        translator_class = self.translator_class
+        if settings.translator_timing:
+            self.translator_class = timed(translator_class)
+        else:
+            self.document.translated_slides = translate_slides(
+                translator_class, self.document, settings.translate_jobs)
+        try:
+            writer_baseclass.translate(self)
+        finally:
+            self.translator_class = translator_class
+            self.document.translated_slides = None
+        if settings.translator_timing:
+            sys.stderr.write(self.visitor.timing.report(
+                settings.translator_timing))
+        if settings.hash_assets and not destination_path:
+            self.document.reporter.warning(
+                '--hash-assets requires an output file')
+        if settings.service_worker and not destination_path:
+            self.document.reporter.warning(
+                '--service-worker requires an output file')
+        if not destination_path:
+            return
+        html_dir = os.path.dirname(destination_path)
+        reveal_dir = self.visitor.reveal_dir
+        if is_remote(reveal_dir):  # purged copies go in css/purged
+            top = html_dir or os.curdir
+            lock = os.path.join(top, 'css', 'purged')
+        else:
+            top = lock = os.path.join(html_dir, reveal_dir)
+        if (settings.purge_css or settings.hash_assets or
+                os.path.isfile(os.path.join(top, generations_file))):
+            # Presentations may share the copies, see rst2slides.assets.
+            with install_lock(lock):
+                generated = set()
+                if settings.purge_css:
+                    self.output = purge_stylesheets(
+                        self.output, html_dir, reveal_dir,
+                        [html for _, html in self.visitor.chunks], generated)
+                if settings.hash_assets:
+                    self.output, manifest = hash_assets(
+                        self.output, html_dir, reveal_dir, generated)
+                    write_manifest(destination_path, manifest)
+                replace_generation(top, destination_path, generated)
+        if settings.optimized_head or settings.critical_css:
+            self.output = optimize_head(self.output, html_dir,
+                                        settings.critical_css)
+        if settings.service_worker:
+            self.output = register_service_worker(self.output,
+                                                  destination_path)
+
+    # document attributes which reveal directive options may change
+    variant_attributes = ('reveal', 'mathjax', 'theme', 'hljs', 'reveal_dir',
+                          'reveal_plugins')
+
+    def write(self, document, destination):
+        destination_path = output_path(destination)
+        outputs = [destination_path or '-']  # - is standard output
+        unchanged = []
+        variants = document.settings.variant or []
+        if variants and not destination_path:
+            # Not printed, standard output is the presentation.
+            document.reporter.warning('--variant requires an output file')
+            variants = []
+        # Write the variants first, so that the writer state is left for
+        # the main output (the publisher assembles parts after writing).
+        for spec in variants:
+            name, options = parse_variant(spec)
+            path = '{}-{}.html'.format(os.path.splitext(destination_path)[0],
+                                       name)
+            saved = {attr: getattr(document, attr)
+                     for attr in self.variant_attributes
+                     if hasattr(document, attr)}
+            apply_reveal_options(document, options, merge=True)
+            settings = document.settings
+            try:
+                variant = AtomicFileOutput(
+                    destination_path=path, encoding=settings.output_encoding,
+                    error_handler=settings.output_encoding_error_handler)
+                self.write_output(document, variant)
+            finally:
+                for attr in self.variant_attributes:
+                    if attr in saved:
+                        setattr(document, attr, saved[attr])
+                    elif hasattr(document, attr):
+                        delattr(document, attr)
+            outputs.append(path)
+            unchanged.append(variant.unchanged)
+        destination = atomic_output(destination)
+        output = self.write_output(document, destination)
+        # True if no output file was replaced, for batch build reports
+        self.unchanged = (getattr(destination, 'unchanged', False) and
+                          all(unchanged))
+        settings = document.settings
+        if settings.depfile or settings.dependency_manifest:
+            deps = dependencies(document, destination_path)
+            if settings.depfile:
+                write_depfile(settings.depfile, outputs, deps)
+            if settings.dependency_manifest:
+                write_dependency_manifest(settings.dependency_manifest,
+                                          outputs, deps)
+        return output
+
+    def write_output(self, document, destination):
+        """Write one output file and its fragments, indices, and so on."""
+        output = writer_baseclass.write(self, document, destination)
+        destination_path = output_path(destination)
+        outputs = []  # other files written, for --precompress
+        if self.visitor.chunks:
+            settings = document.settings
+            outputs += write_chunks(destination_path, self.visitor.chunks,
+                                    settings.output_encoding,
+                                    settings.output_encoding_error_handler)
+        if destination_path and document.chunk_dir:
+            remove_stale_chunks(destination_path, document.chunk_dir, outputs)
+        if getattr(document, 'search_index', None):
+            index = search_index(document, document.settings.search_notes)
+            path = os.path.join(os.path.dirname(destination_path),
+                                document.search_index)
+            write_index(path, index)
+            outputs.append(path)
+        if document.settings.service_worker and destination_path:
+            write_service_worker(self.output, destination_path,
+                                 [html for _, html in self.visitor.chunks])
+            outputs += service_worker_names(destination_path)
+        if document.settings.precompress and destination_path:
+            precompress_presentation(self.output, destination_path,
+                                     self.visitor.reveal_dir, outputs)
+        return output
+
 
-REVEAL_DIR = local_directives.REVEAL_DIR = 'ui'
 REVEAL_THEME = 'beige'
 HLJS_STYLE = 'github'
 
+
+def js_string(text):
+    """Escape `text` for a single quoted javascript string in html.
+
+    The text is JSON encoded, and < escaped, so it can end neither the
+    string nor the script element.
+    """
+    return (json.dumps(text)[1:-1].replace("'", "\\'")
+            .replace('<', '\\u003c'))
+
 # highlight.js wants simply
 # <pre><code class="python"> ... </code></pre>   "nohighlight" to disable
 # notable styles, github is best light, zenburn or obsidian best dark:
@@ -203,7 +496,7 @@ class HTMLTranslator(html_baseclass):
 <meta name="apple-mobile-web-app-status-bar-style" content="black-translucent" />
 
 <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no">
-
+%(preload)s
 <link rel="stylesheet" href="%(reveal_dir)s/css/reveal.css">
 <style>
   .reveal .slides {text-align:left;}
@@ -218,6 +511,12 @@ class HTMLTranslator(html_baseclass):
 <link rel="stylesheet" href="%(reveal_dir)s/hljs/%(hljs_style)s.css">
 
 <!-- Printing and PDF exports -->
+%(print_css)s
+<!--[if lt IE 9]>
+<script src="%(reveal_dir)s/lib/js/html5shiv.js"></script>
+<![endif]-->
+"""  # noqa
+    reveal_print_script = """\
 <script>
         var link = document.createElement( 'link' );
         link.rel = 'stylesheet';
@@ -225,14 +524,29 @@ class HTMLTranslator(html_baseclass):
         link.href = window.location.search.match( /print-pdf/gi ) ? '%(reveal_dir)s/css/print/pdf.css' : '%(reveal_dir)s/css/print/paper.css';
         document.getElementsByTagName( 'head' )[0].appendChild( link );
 </script>
-
-<!--[if lt IE 9]>
-<script src="%(reveal_dir)s/lib/js/html5shiv.js"></script>
-<![endif]-->
 """  # noqa
-    reveal_ending_scripts = """
-<script src="%(reveal_dir)s/lib/js/head.min.js"></script>
-<script src="%(reveal_dir)s/js/reveal.js"></script>
+    # --optimized-head versions, see rst2slides.head
+    reveal_preload = """\
+<link rel="preload" href="%(reveal_dir)s/js/reveal.js" as="script">
+<link rel="preload" href="%(reveal_dir)s/lib/js/head.min.js" as="script">
+"""
+    reveal_preload_background = """\
+<link rel="preload" href="%s" as="image">
+"""
+    reveal_print_link = """\
+<link rel="stylesheet" href="%(reveal_dir)s/css/print/paper.css" media="print" id="print-css">
+"""  # noqa
+    reveal_pdf_script = """
+<script>
+    if ( window.location.search.match( /print-pdf/gi ) ) {
+        var link = document.getElementById( 'print-css' );
+        link.href = '%(reveal_dir)s/css/print/pdf.css';
+        link.media = 'all';
+    }
+</script>"""
+    reveal_ending_scripts = """%(reveal_pdf)s%(reveal_math_config)s
+<script src="%(reveal_src)s/lib/js/head.min.js"></script>
+<script src="%(reveal_src)s/js/reveal.js"></script>
 
 <script>
 
@@ -243,26 +557,38 @@ class HTMLTranslator(html_baseclass):
 %(reveal_math)s
         // Optional reveal.js plugins
         dependencies: [
-            { src: '%(reveal_dir)s/lib/js/classList.js', condition: function() { return !document.body.classList; } },%(reveal_math_dep)s
-            { src: '%(reveal_dir)s/plugin/markdown/marked.js', condition: function() { return !!document.querySelector( '[data-markdown]' ); } },
-            { src: '%(reveal_dir)s/plugin/markdown/markdown.js', condition: function() { return !!document.querySelector( '[data-markdown]' ); } },
-            { src: '%(reveal_dir)s/plugin/highlight/highlight.js', async: true, condition: function() { return !!document.querySelector( 'pre code' ); }, callback: function() { hljs.initHighlightingOnLoad(); } },
-            { src: '%(reveal_dir)s/plugin/search/search.js', async: true },
-            { src: '%(reveal_dir)s/plugin/zoom-js/zoom.js', async: true },
-            { src: '%(reveal_dir)s/plugin/notes/notes.js', async: true }
+            %(reveal_deps)s
         ]
     });
 
 </script>
 """  # noqa
+    # Entries of the Reveal.initialize dependencies, in order.
+    reveal_classlist_dep = """\
+{ src: '%(reveal_dir)s/lib/js/classList.js', condition: function() { return !document.body.classList; } }"""  # noqa
+    reveal_markdown_deps = """\
+{ src: '%(reveal_dir)s/plugin/markdown/marked.js', condition: function() { return !!document.querySelector( '[data-markdown]' ); } },
+            { src: '%(reveal_dir)s/plugin/markdown/markdown.js', condition: function() { return !!document.querySelector( '[data-markdown]' ); } }"""  # noqa
+    reveal_highlight_dep = """\
+{ src: '%(reveal_dir)s/%(highlight_js)s', async: true, condition: function() { return !!document.querySelector( 'pre code' ); }, callback: function() { hljs.initHighlightingOnLoad(); } }"""  # noqa
+    reveal_zoom_dep = """\
+{ src: '%(reveal_dir)s/plugin/zoom-js/zoom.js', async: true }"""
+    reveal_notes_dep = """\
+{ src: '%(reveal_dir)s/plugin/notes/notes.js', async: true }"""
     reveal_math_option = """\
         math: {
             mathjax: '%(mathjax)s',
             config: '%(config)s'
         },
 """
-    reveal_math_dep = """
-            { src: '%(reveal_dir)s/plugin/math/math.js', async: true },"""
+    reveal_math_dep = """\
+{ src: '%(reveal_dir)s/plugin/math/math.js', async: true }"""
+    reveal_chunks_dep = """\
+{ src: '%(reveal_dir)s/plugin/chunks/chunks.js' }"""
+    reveal_search_dep = """\
+{ src: '%(reveal_dir)s/plugin/search/search.js', async: true }"""
+    reveal_search_index_dep = """\
+{ src: '%(reveal_dir)s/plugin/search-index/search-index.js', async: true }"""
 
     def __init__(self, document):
         # html5_polyglot minimal.css and plain.css break reveal.js
@@ -278,17 +604,93 @@ class HTMLTranslator(html_baseclass):
         for p in [d for d in sdir if 'html5_polyglot' in d]:
             sdir.remove(p)
         html_baseclass.__init__(self, document)  # super() broken in PY2
-        self.reveal_dir = getattr(document, 'reveal_dir', REVEAL_DIR)
+        self.reveal_dir = getattr(document, 'reveal_dir', settings.reveal_dir)
+        # The reveal_dir url is relative to the html, so install there.
+        html_dir = getattr(document, 'html_dir', '')
+        if html_dir and not is_remote(self.reveal_dir):
+            self.reveal_path = os.path.join(html_dir, self.reveal_dir)
+        else:
+            self.reveal_path = self.reveal_dir
         # add this at the beginning, so that extra CSS are added afterwards
         # and can override the reveal.js CSS rules
         hljs = getattr(document, 'hljs', HLJS_STYLE)
         theme = getattr(document, 'theme', REVEAL_THEME)
-        self.stylesheet.insert(0, self.reveal_stylesheet_template %
-                               {'reveal_dir': self.reveal_dir,
-                                'theme': theme, 'hljs_style': hljs})
+        reveal = {'reveal_dir': self.attval(self.reveal_dir),
+                  'theme': self.attval(theme),
+                  'hljs_style': self.attval(hljs), 'preload': ''}
+        self.optimized_head = (settings.optimized_head or
+                               settings.critical_css)
+        if self.optimized_head:
+            reveal['preload'] = self.reveal_preload % reveal
+            background = self.first_background(document)
+            if background:
+                reveal['preload'] += (self.reveal_preload_background %
+                                      self.attval(background))
+            reveal['print_css'] = self.reveal_print_link % reveal
+        else:
+            reveal['print_css'] = self.reveal_print_script % {
+                'reveal_dir': js_string(self.reveal_dir)}
+        self.stylesheet.insert(0, self.reveal_stylesheet_template % reveal)
         self.close_section = False
+        # (start, end, section) body indices of each top-level slide
+        self.slide_spans = []
+        self.chunks = []  # (url, html) fragments for --chunk-slides
+        # (translated, math_header, mathjax_url) from --translate-jobs
+        self.translated = getattr(document, 'translated_slides', None)
+
+    @staticmethod
+    def first_background(document):
+        """Return the background image url of the first slide, or None."""
+        for _, _, node in iter_slides(document):
+            attribs = getattr(node, 'reveal_data_attribs', None) or {}
+            return attribs.get('data-background-image')
+        return None
+
+    @staticmethod
+    def detect_plugins(document):
+        """Return set of optional reveal.js plugins `document` needs.
+
+        Markdown is never needed, since rst produces no data-markdown
+        sections.  Search and zoom are interactive, so always included.
+        The reveal directive plugins option adds to the set.
+        """
+        plugins = {'search', 'zoom'}
+        plugins.update(getattr(document, 'reveal_plugins', ()))
+        if any('code' in node['classes']
+               for node in document.findall(nodes.literal_block)):
+            plugins.add('highlight')
+        if 'defaultTiming' in getattr(document, 'reveal', {}):
+            plugins.add('notes')
+        for node in document.findall(nodes.section):
+            attribs = getattr(node, 'reveal_data_attribs', None) or {}
+            if ((hasattr(node, 'aside_section') and
+                 'notes' in node['classes']) or
+                    'data-timing' in attribs or 'data-notes' in attribs):
+                plugins.add('notes')
+                break
+        return plugins
+
+    def highlight_plugin(self, document):
+        """Return path of highlight plugin relative to reveal.js."""
+        if not self.settings.hljs_subset or is_remote(self.reveal_dir):
+            return bundle_name.replace(os.sep, '/')
+        if (self.settings.download and
+                not os.path.isfile(os.path.join(self.reveal_path,
+                                                bundle_name))):
+            setup(self.reveal_path, None)
+        path = highlight_subset(self.reveal_path, code_languages(document),
+                                self.settings.download)
+        if path is None and not self.settings.download:
+            return bundle_name.replace(os.sep, '/')  # install nothing
+        if path is None:
+            print("WARNING: cannot subset {}, using all languages"
+                  "".format(os.path.join(self.reveal_path, bundle_name)))
+            return bundle_name.replace(os.sep, '/')
+        return path
 
     def depart_document(self, node):
+        if self.translated and self.translated[1] and not self.math_header:
+            _, self.math_header, self.mathjax_url = self.translated
         self.head_prefix.extend([self.doctype,
                                  self.head_prefix_template %
                                  {'lang': self.settings.language_code}])
@@ -299,34 +701,53 @@ class HTMLTranslator(html_baseclass):
         # skip content-type meta tag with interpolated charset value:
         self.html_head.extend(self.head[1:])
         self.body_prefix.append('<div class="reveal">\n<div class="slides">\n')
-        reveal = {'reveal_dir': self.reveal_dir}
+        # Values in javascript strings, except reveal_src in html.
+        reveal = {'reveal_dir': js_string(self.reveal_dir),
+                  'reveal_src': self.attval(self.reveal_dir)}
         if self.math_header:
             # Either a math role or directive is actually present.
             if hasattr(node, 'mathjax'):
                 mathjax = node.mathjax
             else:
                 mathjax = mathjax_default.copy()
-            local_mathjax = glob(os.path.join(self.reveal_dir, 'MathJax*'))
+            local_mathjax = glob(os.path.join(self.reveal_path, 'MathJax*'))
             if local_mathjax:
                 local_mathjax.sort()
-                local_mathjax = local_mathjax[-1]
-                mathjax['mathjax'] = os.path.join(local_mathjax, 'MathJax.js')
+                local_mathjax = os.path.basename(local_mathjax[-1])
+                mathjax['mathjax'] = os.path.join(self.reveal_dir,
+                                                  local_mathjax, 'MathJax.js')
                 local_mathjax = False  # already exists, no need to download
             elif (not mathjax['mathjax'].startswith('http') and
                   not os.path.exists(mathjax['mathjax'])):
                 path = mathjax['mathjax'].rsplit('-', 1)
                 if len(path) < 2 or not path[0].endswith('MathJax'):
-                    print("WARNING: No such path as {}"
-                          "".format(mathjax['mathjax']))
+                    node.reporter.warning('No such path as {}'.format(
+                        mathjax['mathjax']))
                     local_mathjax = None
                 else:
                     i = len(os.path.join(self.reveal_dir, 'MathJax-'))
                     local_mathjax = os.path.join(path[-1][i:], 'MathJax.js')
+            reveal['reveal_math_config'] = ''
+            if mathjax['config'] == mathjax_default['config']:
+                # No mathjaxConfig option, see rst2slides.mathconfig.
+                config, reveal['reveal_math_config'] = mathjax_config(
+                    node, not mathjax['mathjax'].startswith('http'))
+                mathjax = dict(mathjax, config=config)
             reveal['reveal_math_dep'] = self.reveal_math_dep % reveal
-            reveal['reveal_math'] = self.reveal_math_option % mathjax
+            reveal['reveal_math'] = self.reveal_math_option % {
+                key: js_string(value) for key, value in mathjax.items()}
         else:
             reveal['reveal_math_dep'] = reveal['reveal_math'] = ''
+            reveal['reveal_math_config'] = ''
             local_mathjax = None
+        reveal['reveal_pdf'] = ''
+        if self.optimized_head:
+            reveal['reveal_pdf'] = self.reveal_pdf_script % reveal
+        reveal['reveal_chunks_dep'] = ''
+        if self.settings.chunk_slides:
+            self.chunk_slides(self.settings.chunk_slides)
+            if self.chunks:
+                reveal['reveal_chunks_dep'] = self.reveal_chunks_dep % reveal
         reveal['reveal_init'] = ''
         if hasattr(node, 'reveal'):
             # The reveal:: directive is present.
@@ -337,14 +758,35 @@ class HTMLTranslator(html_baseclass):
                     try:
                         v = float(val)
                     except ValueError:
-                        val = repr(val)
-                        if val.startswith('u'):
-                            val = val[1:]
+                        val = "'{}'".format(js_string(val))
                     else:
                         val = int(v)
                         if v != val:
                             val = v
                 reveal['reveal_init'] += '        {}: {},\n'.format(opt, val)
+        search_index_url = getattr(node, 'search_index', None)
+        if search_index_url:
+            reveal['reveal_init'] += "        searchIndex: '{}',\n".format(
+                js_string(search_index_url))
+            reveal['reveal_search_dep'] = self.reveal_search_index_dep % reveal
+        else:
+            reveal['reveal_search_dep'] = self.reveal_search_dep % reveal
+        plugins = self.detect_plugins(node)
+        deps = [self.reveal_classlist_dep % reveal, reveal['reveal_math_dep'],
+                reveal['reveal_chunks_dep']]
+        if 'markdown' in plugins:
+            deps.append(self.reveal_markdown_deps % reveal)
+        if 'highlight' in plugins:
+            reveal['highlight_js'] = self.highlight_plugin(node)
+            deps.append(self.reveal_highlight_dep % reveal)
+        if 'search' in plugins or search_index_url:
+            deps.append(reveal['reveal_search_dep'])
+        if 'zoom' in plugins:
+            deps.append(self.reveal_zoom_dep % reveal)
+        if 'notes' in plugins:
+            deps.append(self.reveal_notes_dep % reveal)
+        reveal['reveal_deps'] = ',\n            '.join(dep for dep in deps
+                                                     if dep)
         self.body_suffix.insert(0, '</div>\n</div>\n' +
                                 self.reveal_ending_scripts % reveal)
         self.fragment.extend(self.body)  # self.fragment is the "naked" body
@@ -352,8 +794,39 @@ class HTMLTranslator(html_baseclass):
                               self.docinfo + self.body +
                               self.body_suffix[:-1])
         assert not self.context, 'len(context) = %s' % len(self.context)
+        if not self.settings.download:
+            return
         # Download local copy of reveal.js and optionally MathJax.
-        setup(self.reveal_dir, local_mathjax)
+        setup(self.reveal_path, local_mathjax)
+        if self.chunks:
+            install_loader(self.reveal_path)
+        if search_index_url:
+            install_plugin(self.reveal_path)
+
+    def chunk_slides(self, keep):
+        """Replace top-level slides after the first `keep` by placeholders."""
+        directory = getattr(self.document, 'chunk_dir', None)
+        if len(self.slide_spans) <= keep:
+            return
+        if not directory:
+            self.document.reporter.warning(
+                '--chunk-slides requires an output file')
+            return
+        # The title page is the first reveal.js slide, if present.
+        first = 1 if self.title else 0
+        for i in range(len(self.slide_spans) - 1, keep - 1, -1):
+            start, end, node = self.slide_spans[i]
+            url = chunk_name(directory, first + i)
+            ids = [id for section in node.findall(nodes.section)
+                   for id in section['ids']]
+            # Keep backgrounds and transitions while the slide loads.
+            attribs = dict(getattr(node, 'reveal_data_attribs', {}))
+            attribs.update({'data-chunk': url,
+                            'data-chunk-ids': ' '.join(ids)})
+            self.chunks.insert(0, (url, ''.join(self.body[start:end])))
+            self.body[start:end] = ['\n' + self.starttag(node, 'section',
+                                                          **attribs),
+                                    '</section>\n']
 
     def visit_section(self, node, *args, **kwargs):
         # Do not get here for title page section.
@@ -367,6 +840,16 @@ class HTMLTranslator(html_baseclass):
             # Close the extra vertical slide section tag.
             self.body.append('</section>\n')
             self.close_section = False
+        if self.section_level == 0:
+            self.slide_spans.append((len(self.body), None, node))
+            if self.translated and id(node) in self.translated[0]:
+                # Already translated by a --translate-jobs worker.
+                body, self.close_section, meta = self.translated[0][id(node)]
+                self.body.extend(body)
+                self.meta.extend(meta)
+                self.slide_spans[-1] = (self.slide_spans[-1][0],
+                                        len(self.body), node)
+                raise nodes.SkipNode
 
         self.section_level += 1
         if (self.section_level == 1 and any((isinstance(el, nodes.section) and
@@ -390,14 +873,19 @@ class HTMLTranslator(html_baseclass):
             return
         self.section_level -= 1
         self.body.append('</section>\n')
+        if self.section_level == 0:
+            start = self.slide_spans[-1][0]
+            self.slide_spans[-1] = (start, len(self.body), node)
 
     def visit_title(self, node):
         initlev = self.initial_header_level
         parent = node.parent
         is_doctitle = isinstance(parent, nodes.document)
-        if self.close_section or is_doctitle:
+        if (self.close_section and isinstance(parent, nodes.section) or
+                is_doctitle):
             # If there are subsections add an extra <section> in order to
-            # support vertical slides.
+            # support vertical slides.  (Titles of tables, topics, and so
+            # on in the slide content do not.)
             # Also get here before the whole document title, since every
             # slide is a subsection of the whole document.
             # In every case, this <section> tag is the innermost one for the
@@ -438,24 +926,71 @@ class HTMLTranslator(html_baseclass):
             html_baseclass.depart_subtitle(self, node)
 
 
-def main():
-    description = ('Generates reveal.js slideshow from reStructuredText '
-                   'sources.  ' + default_description)
+# Override settings to get a default set more consistent with
+# reveal.js slideshow.
+# The math_output and syntax_highlight switches are required.
+# The initial_header_level gets the section headers the level
+# the reveal.js demo expects.
+settings_overrides = {
+    'math_output': 'mathjax '+mathjax_default['mathjax'],
+    'syntax_highlight': 'none',
+    'initial_header_level': 2,
+    'xml_declaration': False,
+    'strip_comments': True,
+    'stylesheet_path': 'css/custom.css',
+    'embed_stylesheet': False}
+
+
+description = ('Generates reveal.js slideshow from reStructuredText '
+               'sources.  Use --check <source>... to check sources '
+               'without building them.  ' + default_description)
+
+
+def option_parser():
+    """Return the command line option parser `main` uses.
+
+    Its defaults include the settings of the docutils configuration files
+    of the current directory and environment.
+    """
+    with warnings.catch_warnings():  # as publish_cmdline does
+        warnings.simplefilter('ignore', DeprecationWarning)
+        return frontend.OptionParser(
+            components=(Parser(), Reader(), Writer()),
+            defaults=settings_overrides, read_config_files=True,
+            usage=default_usage, description=description)
+
+
+def main(parser=None):
+    """Build the presentation the command line requests.
+
+    The rst2slides.daemon passes a command line option `parser` made by
+    `option_parser` ahead of time.
+    """
+    args = sys.argv[1:]
+    if '--check' in args:
+        # Parse and validate only, see rst2slides.check.
+        from .check import check_main
+        args.remove('--check')
+        options = [arg for arg in args if arg.startswith('-')]
+        if options:
+            sys.stderr.write('rst2slides: error: --check takes only source '
+                             'files, not ' + ' '.join(options) + '\n')
+            sys.exit(2)
+        sys.exit(check_main(args))
+    settings = parser.parse_args(args) if parser else None
     writer = Writer()
-    # Override settings to get a default set more consistent with
-    # reveal.js slideshow.
-    # The math_output and syntax_highlight switches are required.
-    # The initial_header_level gets the section headers the level
-    # the reveal.js demo expects.
-    publish_cmdline(writer=writer, description=description,
-                    settings_overrides={
-                        'math_output': 'mathjax '+mathjax_default['mathjax'],
-                        'syntax_highlight': 'none',
-                        'initial_header_level': 2,
-                        'xml_declaration': False,
-                        'strip_comments': True,
-                        'stylesheet_path': 'css/custom.css',
-                        'embed_stylesheet': False})
+    publish_cmdline(parser=Parser(), writer=writer, settings=settings,
+                    description=description,
+                    settings_overrides=settings_overrides)
+
+
+def render(source, parts=False, **options):
+    """Render rst `source` string, see rst2slides.render."""
+    overrides = dict(settings_overrides, download=False, _disable_config=True)
+    overrides.update(options)
+    result = publish_parts(source, parser=Parser(), writer=Writer(),
+                           settings_overrides=overrides)
+    return result if parts else result['whole']
 
 
 if __name__ == '__main__':
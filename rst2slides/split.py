@@ -0,0 +1,319 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Split slides which overflow the reveal.js canvas into vertical slides.
+
+With the ``--split-slides`` writer option, the SlideSplitter transform
+estimates the rendered height of every slide from its content, using the
+width and height of the reveal directive (default 960 by 700): lines of
+wrapped text, list items, table rows, literal block lines (reveal.js
+scrolls code blocks taller than 400 pixels), and image heights given by
+their height option (half the default canvas height for other images and
+videos).  When a slide is taller than the canvas, its content
+is divided among continuation slides with the same title, background, and
+data-state, which become vertical slides below it (or, for a slide which
+is already vertical, after it), as if the source had subsections.  Long
+bullet, enumerated, and other lists are divided between items, and tables
+between rows, repeating the table title and header rows.  Speaker notes
+stay on the first part of the slide.
+
+The estimate assumes the reveal.js theme metrics below, so it is only
+approximate; continuation sections have the class "continued" for any
+adjustments a stylesheet wants to make.
+
+"""
+
+from docutils import nodes
+from docutils.transforms import Transform
+
+from .doctree import iter_slides, is_slide
+
+canvas = 960, 700  # reveal.js default width, height
+font_size = 40  # px, reveal.js themes use 38 to 42
+line_height = 1.3 * font_size
+char_width = 0.5 * font_size  # average
+block_margin = 20  # above and below paragraphs, lists, tables, ...
+title_size = 1.6  # h2 font size in em
+code_line = 0.55 * 1.2 * font_size
+code_max = 400  # taller code blocks scroll
+list_indent = font_size
+cell_padding = 0.4 * font_size
+math_line = 1.5 * line_height
+media_height = canvas[1] / 2.  # images without a height option, videos
+list_nodes = (nodes.bullet_list, nodes.enumerated_list, nodes.definition_list,
+              nodes.field_list, nodes.option_list)
+
+
+def pixels(value, default):
+    """Return size attribute `value` in pixels, or `default`."""
+    value = str(value or '').strip()
+    if value.endswith('px'):
+        value = value[:-2]
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+def text_height(text, width, size=1.):
+    """Return height of `text` wrapped in `width` at font `size` (em)."""
+    per_line = max(1, int(width / (char_width * size)))
+    lines = sum(max(1, -(-len(line) // per_line))
+                for line in text.splitlines() or [''])
+    return lines * line_height * size
+
+
+def is_empty(node):
+    """Return true if `node` takes no room on the slide."""
+    return isinstance(node, nodes.Invisible) or hasattr(node, 'aside_section')
+
+
+def node_height(node, width, margin=block_margin):
+    """Return estimated rendered height of `node` in `width` pixels."""
+    if is_empty(node):
+        return 0
+    if isinstance(node, nodes.Text):
+        return text_height(node.astext(), width)
+    if isinstance(node, nodes.title):
+        return text_height(node.astext(), width, title_size) + margin
+    if isinstance(node, nodes.literal_block):
+        lines = node.astext().count('\n') + 1
+        return min(lines * code_line, code_max) + margin
+    if isinstance(node, nodes.math_block):
+        return (node.astext().strip().count('\n') + 1) * math_line + margin
+    if isinstance(node, nodes.image):
+        return pixels(node.get('height'), media_height) + margin
+    if isinstance(node, nodes.raw):  # a video if it has a uri
+        return media_height + margin if node.get('uri') else 0
+    if isinstance(node, nodes.table):
+        return table_overhead(node, width) + sum(
+            row_height(row, width) for row in table_rows(node))
+    if isinstance(node, list_nodes):
+        return margin + sum(node_height(item, width - list_indent, 0)
+                            for item in node.children)
+    if isinstance(node, nodes.TextElement):
+        return text_height(node.astext(), width) + margin
+    return sum(node_height(child, width, margin) for child in node.children)
+
+
+def table_body(table):
+    for tgroup in table.findall(nodes.tgroup):
+        for child in tgroup.children:
+            if isinstance(child, nodes.tbody):
+                return tgroup, child
+        break
+    return None, None
+
+
+def table_rows(table):
+    tbody = table_body(table)[1]
+    return list(tbody.children) if tbody is not None else []
+
+
+def row_height(row, width):
+    cell_width = width / max(1, len(row.children))
+    return cell_padding + max([sum(node_height(child, cell_width, 0)
+                                   for child in entry.children)
+                               for entry in row.children] or [0])
+
+
+def table_overhead(table, width):
+    """Return height of the title and header rows of `table`."""
+    height = block_margin
+    for child in table.children:
+        if isinstance(child, nodes.title):
+            height += text_height(child.astext(), width)
+    tgroup = table_body(table)[0]
+    if tgroup is not None:
+        for thead in tgroup.findall(nodes.thead):
+            height += sum(row_height(row, width) for row in thead.children)
+    return height
+
+
+def shallow_copy(node):
+    """Return copy of element `node` with no children, ids, or names."""
+    copy = node.copy()
+    for key in copy.list_attributes:
+        copy[key] = [] if key in ('ids', 'names') else list(node[key])
+    return copy
+
+
+def without_ids(node):
+    """Return deep copy of `node` with no ids or names."""
+    node = node.deepcopy()
+    for element in node.findall(nodes.Element):
+        element['ids'] = []
+        element['names'] = []
+    return node
+
+
+def groups(items, overhead, first_room, room):
+    """Divide (item, height) `items` into lists fitting the rooms.
+
+    The first list must fit in `first_room`, the others in `room`, and each
+    also holds `overhead`.  The first list is empty if even the first item
+    would fit better on a new slide.
+    """
+    result, group, used, limit = [], [], overhead, first_room
+    for item, height in items:
+        if used + height > limit and (group or limit < room):
+            result.append(group)
+            group, used, limit = [], overhead, room
+        group.append(item)
+        used += height
+    result.append(group)
+    return result
+
+
+def split_list(node, width, first_room, room):
+    """Return pieces of list `node`, see `split_node`."""
+    items = [(item, node_height(item, width - list_indent, 0))
+             for item in node.children]
+    parts = groups(items, block_margin, first_room, room)
+    pieces, start, first = [], node.get('start', 1), True
+    for group in parts:
+        if not group:
+            pieces.append(None)
+            continue
+        if first:
+            piece, first = node, False
+            piece.children = []
+        else:
+            piece = shallow_copy(node)
+            if isinstance(node, nodes.enumerated_list):
+                piece['start'] = start
+        piece.extend(group)
+        start += len(group)
+        pieces.append(piece)
+    return pieces
+
+
+def split_table(node, width, first_room, room):
+    """Return pieces of table `node`, see `split_node`."""
+    tgroup, tbody = table_body(node)
+    if tbody is None:
+        return None
+    items = [(row, row_height(row, width)) for row in tbody.children]
+    parts = groups(items, table_overhead(node, width), first_room, room)
+    pieces, first = [], True
+    for group in parts:
+        if not group:
+            pieces.append(None)
+            continue
+        if first:
+            piece, body, first = node, tbody, False
+            body.children = []
+        else:
+            piece, group_copy, body = (shallow_copy(node),
+                                       shallow_copy(tgroup),
+                                       shallow_copy(tbody))
+            for child in node.children:
+                piece.append(group_copy if child is tgroup
+                             else without_ids(child))
+            for child in tgroup.children:
+                group_copy.append(body if child is tbody
+                                  else without_ids(child))
+        body.extend(group)
+        pieces.append(piece)
+    return pieces
+
+
+def split_node(node, width, first_room, room):
+    """Return list of pieces of `node` fitting the rooms, or None.
+
+    The first piece fits in the `first_room` left on the current slide
+    (or is None if the node should start on a new slide), the others fit
+    in `room`.  Return None if `node` cannot be split.
+    """
+    if isinstance(node, list_nodes) and len(node.children) > 1:
+        return split_list(node, width, first_room, room)
+    if isinstance(node, nodes.table):
+        return split_table(node, width, first_room, room)
+    return None
+
+
+def paginate(content, width, height):
+    """Divide `content` nodes into lists fitting `height`."""
+    pages, page, used = [], [], 0
+    for node in content:
+        node_size = node_height(node, width)
+        if used + node_size <= height:
+            page.append(node)
+            used += node_size
+            continue
+        pieces = split_node(node, width, height - used, height)
+        if pieces is None:
+            if page:
+                pages.append(page)
+            page, used = [node], node_size
+            continue
+        for i, piece in enumerate(pieces):
+            if i:
+                pages.append(page)
+                page, used = [], 0
+            if piece is not None:
+                page.append(piece)
+                used += node_height(piece, width)
+    pages.append(page)
+    return [page for page in pages if page] or [[]]
+
+
+class SlideSplitter(Transform):
+    """Split slides taller than the reveal.js canvas into vertical slides."""
+    default_priority = 420  # after RevealData and BackgroundAttribute
+
+    def apply(self):
+        document = self.document
+        if not getattr(document.settings, 'split_slides', False):
+            return
+        reveal = getattr(document, 'reveal', {})
+        width = pixels(reveal.get('width'), canvas[0])
+        height = pixels(reveal.get('height'), canvas[1])
+        for _, _, node in list(iter_slides(document)):
+            if node is not document:
+                self.split_slide(node, width, height)
+
+    def split_slide(self, node, width, height):
+        title = node.children[0] if node.children and isinstance(
+            node[0], nodes.title) else None
+        top = isinstance(node.parent, nodes.document)
+        content = [child for child in node.children[1 if title else 0:]
+                   if not (top and is_slide(child))]
+        room = height - (node_height(title, width) if title else 0)
+        if sum(node_height(child, width) for child in content) <= room:
+            return
+        notes = [child for child in content if hasattr(child, 'aside_section')]
+        pages = paginate([child for child in content if child not in notes],
+                         width, room)
+        if len(pages) < 2:
+            return
+        subslides = [child for child in node.children
+                     if top and is_slide(child)]
+        node.children = []
+        node.extend(([title] if title else []) + pages[0] + notes)
+        attribs = getattr(node, 'reveal_data_attribs', {})
+        attribs = {key: value for key, value in attribs.items()
+                   if key.startswith('data-background') or key == 'data-state'}
+        sections = []
+        for page in pages[1:]:
+            section = nodes.section(classes=['continued'])
+            if title:
+                section.append(without_ids(title))
+            section.extend(page)
+            if attribs:
+                section.reveal_data_attribs = dict(attribs)
+            if hasattr(node, 'background_location'):
+                section.background_location = node.background_location
+            sections.append(section)
+        if top:
+            node.extend(sections + subslides)
+        else:
+            index = node.parent.index(node) + 1
+            node.parent[index:index] = sections
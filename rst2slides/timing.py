@@ -0,0 +1,97 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Per node type timing of the html translator.
+
+With the ``--translator-timing=N`` writer option, the translator records
+the number of calls and the cumulative time spent in the visit_* and
+depart_* method of every node type, and reports the N node types with the
+largest total time on standard error after translation::
+
+    translator timing: top 3 of 41 node types, 0.412 s total
+    node type                 calls   visit s  depart s   total s
+    section                    1501     0.081     0.004     0.085
+    title                      1502     0.062     0.011     0.073
+    literal_block               300     0.035     0.003     0.038
+
+The times exclude the children of each node, which are visited between
+the visit and depart calls.  Without the option, the writer uses the plain
+translator class, so there is no overhead.  Timing also disables
+``--translate-jobs``, since the workers would not report their timing.
+
+"""
+
+from time import perf_counter
+
+_timed_classes = {}
+
+
+class Timing(object):
+    """Call counts and cumulative times per node type."""
+
+    def __init__(self):
+        self.stats = {}  # name: [visits, visit time, departs, depart time]
+
+    def record(self, name, index, seconds):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = [0, 0., 0, 0.]
+        stats[index] += 1
+        stats[index + 1] += seconds
+
+    def report(self, top=20):
+        """Return report of the `top` node types by total time."""
+        rows = sorted(self.stats.items(), key=lambda item: -item[1][1] -
+                      item[1][3])
+        total = sum(s[1] + s[3] for s in self.stats.values())
+        lines = ['translator timing: top {} of {} node types, {:.3f} s total'
+                 ''.format(min(top, len(rows)), len(rows), total),
+                 '{:<24} {:>6} {:>9} {:>9} {:>9}'.format(
+                     'node type', 'calls', 'visit s', 'depart s', 'total s')]
+        for name, (visits, vtime, _, dtime) in rows[:top]:
+            lines.append('{:<24} {:>6} {:>9.3f} {:>9.3f} {:>9.3f}'.format(
+                name, visits, vtime, dtime, vtime + dtime))
+        return '\n'.join(lines) + '\n'
+
+
+def timed(translator_class):
+    """Return subclass of `translator_class` which times its methods."""
+    cls = _timed_classes.get(translator_class)
+    if cls is not None:
+        return cls
+    visit = translator_class.dispatch_visit
+    depart = translator_class.dispatch_departure
+
+    def __init__(self, document):
+        translator_class.__init__(self, document)
+        self.timing = Timing()
+
+    def dispatch_visit(self, node):
+        start = perf_counter()
+        try:
+            return visit(self, node)
+        finally:
+            self.timing.record(node.__class__.__name__, 0,
+                               perf_counter() - start)
+
+    def dispatch_departure(self, node):
+        start = perf_counter()
+        try:
+            return depart(self, node)
+        finally:
+            self.timing.record(node.__class__.__name__, 2,
+                               perf_counter() - start)
+
+    cls = type('Timed' + translator_class.__name__, (translator_class,),
+               {'__init__': __init__, 'dispatch_visit': dispatch_visit,
+                'dispatch_departure': dispatch_departure,
+                '__module__': __name__})
+    _timed_classes[translator_class] = cls
+    return cls
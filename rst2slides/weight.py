@@ -0,0 +1,189 @@
+# Copyright (c) 2018, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory
+# Written by David H. Munro <munro1@llnl.gov>. CODE-754812.
+# All rights reserved.
+#
+# This file is part of rst2slides.
+# For details, see https://github.com/llnl/rst2slides.
+#
+# This code is released under an MIT license, see LICENSE.txt for details.
+
+"""Report the page weight of presentations slide by slide.
+
+This module can be run as a script::
+
+    python -m rst2slides.weight presentation.rst [...] [--budget=SIZE]
+                                [--json]
+
+Each presentation is parsed, and the bytes each slide references are
+totaled: its local background images, video sources, and image files, plus
+the volume of its literal blocks (code) and math.  A file used by several
+slides counts against each of them, but only once in the presentation
+total.  Remote media are listed but not counted.  The shared reveal.js
+assets are the local files the html of the presentation references,
+including the fonts and images used by its stylesheets.  As in check mode,
+paths are relative to the directory containing the presentation, where the
+html is assumed to go.
+
+Slides over the budget (default 1M, where SIZE may have a k or M suffix
+for multiples of 1024 bytes) are flagged, and the exit status is 1 if any
+slide is over budget, 0 otherwise.  With --json, the report for each
+presentation is printed as one line of JSON for CI::
+
+    {"file": "talk.rst", "budget": 1048576, "bytes": 5242880,
+     "assets": {"bytes": 1468006, "files": {"ui/js/reveal.js": 189460, ...}},
+     "slides": [{"h": 3, "v": 0, "id": "results", "title": "Results",
+                 "bytes": 3774874, "media": {"img/run.mp4": 3774874},
+                 "code": 0, "math": 0, "missing": [], "remote": [],
+                 "over": true}, ...]}
+
+"""
+
+import json
+import os.path
+import sys
+
+from docutils import io, nodes
+from docutils.core import publish_doctree, publish_from_doctree
+
+from .assets import is_remote, used_files
+from .check import check_overrides
+from .deps import media_uris
+from .doctree import iter_slides, slide_content, slide_id, slide_title
+
+default_budget = 1 << 20
+code_nodes = (nodes.literal_block,)
+math_nodes = (nodes.math, nodes.math_block)
+
+
+def parse_size(size):
+    """Return number of bytes in `size`, an integer with optional k or M."""
+    size = size.strip()
+    scale = {'k': 1 << 10, 'm': 1 << 20}.get(size[-1:].lower(), 1)
+    if scale > 1:
+        size = size[:-1]
+    return int(size) * scale
+
+
+def text_bytes(nodelist, classes):
+    return sum(len(node.astext().encode('utf-8'))
+               for child in nodelist for node in child.findall(classes))
+
+
+def slide_media(node):
+    """Yield uris of the media slide `node` references, omitting subslides.
+
+    Backgrounds belong to the slide, so they count once even when they are
+    set on the section of a horizontal slide with vertical subslides.
+    """
+    attribs = getattr(node, 'reveal_data_attribs', None)
+    if attribs and 'data-background-image' in attribs:
+        yield attribs['data-background-image']
+    for child in slide_content(node):
+        for _, uri in media_uris(child):
+            yield uri
+
+
+def weigh(path, budget=default_budget, settings_overrides=None):
+    """Return page weight report dict for presentation source `path`."""
+    from .slides import Parser, Writer, settings_overrides as overrides
+    overrides = dict(overrides, **check_overrides)
+    overrides.update(settings_overrides or {})
+    overrides.update(download=False, output_encoding='unicode')
+    document = publish_doctree(None, source_path=path,
+                               source_class=io.FileInput, parser=Parser(),
+                               settings_overrides=overrides)
+    top = os.path.dirname(path)
+    sizes = {}  # uri: bytes, or None if missing
+
+    def local(uri):
+        return os.path.normpath(os.path.join(
+            top, uri.split('#', 1)[0].split('?', 1)[0]))
+
+    def size(uri):
+        if uri not in sizes:
+            path = local(uri)
+            sizes[uri] = (os.path.getsize(path) if os.path.isfile(path)
+                          else None)
+        return sizes[uri]
+
+    slides = []
+    for h, v, node in iter_slides(document):
+        content = slide_content(node)
+        slide = {'h': h, 'v': v, 'id': slide_id(node),
+                 'title': slide_title(node), 'media': {}, 'missing': [],
+                 'remote': [], 'code': text_bytes(content, code_nodes),
+                 'math': text_bytes(content, math_nodes)}
+        for uri in slide_media(node):
+            if is_remote(uri):
+                slide['remote'].append(uri)
+            elif size(uri) is None:
+                slide['missing'].append(uri)
+            else:
+                slide['media'][uri] = size(uri)
+        slide['bytes'] = (sum(slide['media'].values()) + slide['code'] +
+                          slide['math'])
+        slide['over'] = slide['bytes'] > budget
+        slides.append(slide)
+    html = publish_from_doctree(document, writer=Writer(),
+                                settings_overrides=overrides)
+    media = set(local(uri) for uri, n in sizes.items() if n is not None)
+    assets = {}
+    for asset in used_files(html, top or '.'):
+        if os.path.isfile(asset) and os.path.normpath(asset) not in media:
+            assets[os.path.relpath(asset, top or '.')] = os.path.getsize(asset)
+    total = sum(assets.values()) + sum(s['code'] + s['math'] for s in slides)
+    total += sum(n for n in sizes.values() if n)
+    return {'file': path, 'budget': budget, 'bytes': total,
+            'assets': {'bytes': sum(assets.values()), 'files': assets},
+            'slides': slides}
+
+
+def format_report(report):
+    """Return plain text version of page weight `report`."""
+    lines = ['{}: {} bytes, {} in {} shared assets, budget {} per slide'
+             ''.format(report['file'], report['bytes'],
+                       report['assets']['bytes'],
+                       len(report['assets']['files']), report['budget']),
+             '{:>3} {:>3} {:>10} {:>8} {:>8}  {}'.format(
+                 'h', 'v', 'bytes', 'code', 'math', 'slide')]
+    for slide in report['slides']:
+        name = slide['title'] or slide['id'] or '(title page)'
+        notes = ['OVER BUDGET'] if slide['over'] else []
+        notes.extend('missing ' + uri for uri in slide['missing'])
+        lines.append('{:>3} {:>3} {:>10} {:>8} {:>8}  {}{}'.format(
+            slide['h'], slide['v'], slide['bytes'], slide['code'],
+            slide['math'], name, ''.join('  [{}]'.format(note)
+                                         for note in notes)))
+    return '\n'.join(lines) + '\n'
+
+
+def weight_main(paths, budget=default_budget, as_json=False, stream=None):
+    """Report page weight of presentation sources `paths`, return status."""
+    stream = stream or sys.stdout
+    status = 0
+    for path in paths:
+        report = weigh(path, budget)
+        if as_json:
+            stream.write(json.dumps(report, sort_keys=True) + '\n')
+        else:
+            stream.write(format_report(report))
+        if any(slide['over'] for slide in report['slides']):
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if not args or '-h' in args or '--help' in args:
+        print('Usage: python -m rst2slides.weight presentation.rst [...] '
+              '[--budget=SIZE] [--json]')
+        sys.exit(0)
+    budget, as_json = default_budget, '--json' in args
+    if as_json:
+        args.remove('--json')
+    for arg in list(args):
+        if arg.startswith('--budget='):
+            budget = parse_size(arg.split('=', 1)[1])
+            args.remove(arg)
+    sys.exit(weight_main(args, budget, as_json))